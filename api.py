@@ -0,0 +1,185 @@
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+# JSON versions of the pages: ?fields= selects the fields of every record, lists are paginated with
+# ?after=<next cursor of the previous page>&limit=, answer If-None-Match with 304 & are streamed row by row
+
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, current_app, abort, jsonify, stream_with_context
+from extensions import db
+from exporter import FORMATS, export_query, export_chunks
+from formatting import parse_datetime
+from jsonapi import parse_fields, select_fields, parse_limit, list_etag, not_modified, json_response, stream_list, closing_session
+from instrumentation import query_budget
+from models import Venue, Artist, Show, venue_search, artist_search
+from replicas import read_only
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+SHOW_FEED_FIELDS = ('id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link')
+DETAIL_SHOWS_FIELDS = ('upcoming_shows', 'upcoming_shows_count', 'past_shows', 'past_shows_count')
+# the columns whose changes change a venue/artist record of a list: updated_at, & the counters that are updated
+# without it (see ShowCounters)
+ENTITY_ETAG_FIELDS = ('id', 'updated_at', 'upcoming_shows_count', 'past_shows_count')
+
+def apiNotFound():
+  return jsonify({'error': 'not found'}), 404
+
+def apiEntityList(model):
+  columns = model.__table__.columns.keys()
+  fields = parse_fields(columns, ('id', 'name'))
+  limit = parse_limit(current_app.config['API_PAGE_SIZE'], current_app.config['API_MAX_PAGE_SIZE'])
+  try:
+    after = int(request.args.get('after', 0))
+  except ValueError:
+    abort(400)
+
+  etag = list_etag(db.session, db.session.query(*[getattr(model, field) for field in ENTITY_ETAG_FIELDS])
+    .filter(model.id > after)
+    .order_by(model.id)
+    .limit(limit + 1))
+  response = not_modified(etag)
+  if response:
+    return response
+
+  # SQL query:
+  # SELECT id, <fields> FROM <model> WHERE id > after ORDER BY id LIMIT limit + 1
+  # only the requested columns are selected, the rows are fetched in batches while the response is written
+  selected = [model.id] + [getattr(model, field) for field in fields if field != 'id']
+  rows = db.session.query(*selected) \
+    .filter(model.id > after) \
+    .order_by(model.id) \
+    .limit(limit + 1) \
+    .yield_per(current_app.config['API_STREAM_BATCH_SIZE'])
+  return stream_list(rows, limit, lambda row: select_fields(row._asdict(), fields), lambda row: str(row.id), etag)
+
+@bp.route('/venues')
+def api_venues():
+  return apiEntityList(Venue)
+
+@bp.route('/artists')
+def api_artists():
+  return apiEntityList(Artist)
+
+@bp.route('/shows')
+def api_shows():
+  fields = parse_fields(SHOW_FEED_FIELDS, SHOW_FEED_FIELDS)
+  limit = parse_limit(current_app.config['API_PAGE_SIZE'], current_app.config['API_MAX_PAGE_SIZE'])
+  after = request.args.get('after')
+  if after:
+    try:
+      after = Show.decodeCursor(after)
+    except ValueError:
+      abort(400)
+
+  # the names & image of the venue/artist of every show come with it: their updated_at too
+  etag = list_etag(db.session, Show.getFeedQuery(after).with_entities(
+      Show.id,
+      Show.updated_at,
+      Venue.updated_at.label('venue_updated_at'),
+      Artist.updated_at.label('artist_updated_at')
+    ).limit(limit + 1))
+  response = not_modified(etag)
+  if response:
+    return response
+
+  rows = Show.getFeedQuery(after).limit(limit + 1).yield_per(current_app.config['API_STREAM_BATCH_SIZE'])
+  return stream_list(rows, limit, lambda row: select_fields(row._asdict(), fields),
+    lambda row: Show.encodeCursor((row.start_time, row.id)), etag)
+
+@bp.route('/shows', methods=['POST'])
+def api_schedule_shows():
+  # {"shows": [{"venue_id": 1, "artist_id": 2, "start_time": "2035-04-01T20:00:00"}, ...]}: all are created or none,
+  # 201 with the created shows, 400 on malformed rows, 409 on missing venues/artists & double bookings
+  data = request.get_json(silent=True)
+  rows = data.get('shows') if isinstance(data, dict) else None
+  max_size = current_app.config['SHOW_BATCH_MAX_SIZE']
+  if not isinstance(rows, list) or not rows or len(rows) > max_size or not all(isinstance(row, dict) for row in rows):
+    return jsonify({'error': '"shows" must be a list of 1 to %d objects' % max_size}), 400
+
+  shows, errors = Show.parseSchedule(rows)
+  if errors:
+    return jsonify({'errors': errors}), 400
+  errors = Show.scheduleShows(shows, timedelta(minutes=current_app.config['SHOW_SLOT_MINUTES']))
+  if errors:
+    return jsonify({'errors': errors}), 409
+  return jsonify({'shows': [dict(show, start_time=show['start_time'].isoformat()) for show in shows]}), 201
+
+@bp.route('/venues/<int:venue_id>')
+def api_show_venue(venue_id):
+  fields = parse_fields(tuple(Venue.__table__.columns.keys()) + DETAIL_SHOWS_FIELDS, ())
+  venue_details = Venue.getDetailsWithShows(venue_id, datetime.now())
+  if not venue_details:
+    return apiNotFound()
+  return json_response(select_fields(venue_details, fields) if fields else venue_details)
+
+@bp.route('/artists/<int:artist_id>')
+def api_show_artist(artist_id):
+  fields = parse_fields(tuple(Artist.__table__.columns.keys()) + DETAIL_SHOWS_FIELDS, ())
+  artist_details = Artist.getDetailsWithShows(artist_id, datetime.now())
+  if not artist_details:
+    return apiNotFound()
+  return json_response(select_fields(artist_details, fields) if fields else artist_details)
+
+@bp.route('/shows/<int:show_id>')
+def api_show_show(show_id):
+  fields = parse_fields(SHOW_FEED_FIELDS, ())
+  show = Show.query.options(db.joinedload(Show.Venue), db.joinedload(Show.Artist)).filter(Show.id == show_id).first()
+  if not show:
+    return apiNotFound()
+  show_details = Show.getDetails(show)
+  return json_response(select_fields(show_details, fields) if fields else show_details)
+
+@bp.route('/autocomplete/<kind>')
+@read_only
+@query_budget(1)
+def api_autocomplete(kind):
+  # ?q=<typed text>&limit=: [{"id": 1, "name": "..."}] of the venues/artists whose name matches, for the typeahead
+  # of the show form (static/js/script.js); served from the in-memory index or the trigram index (see search.py)
+  searcher = AUTOCOMPLETED.get(kind)
+  if searcher is None:
+    return apiNotFound()
+  limit = parse_limit(current_app.config['AUTOCOMPLETE_LIMIT'], current_app.config['AUTOCOMPLETE_MAX_LIMIT'])
+  response = jsonify({'data': searcher.suggest(request.args.get('q', ''), limit)})
+  # the same prefixes are typed again & again: let the browser reuse the answer for a while
+  response.cache_control.public = True
+  response.cache_control.max_age = current_app.config['AUTOCOMPLETE_MAX_AGE']
+  return response
+
+AUTOCOMPLETED = {
+  'venues': venue_search,
+  'artists': artist_search
+}
+
+EXPORTED_MODELS = {
+  'venues': Venue,
+  'artists': Artist,
+  'shows': Show
+}
+
+@bp.route('/export/<table>')
+def api_export(table):
+  # ?format=csv|jsonl, ?compress=gzip, incremental exports with ?since_id=<last exported id>, ?since=<ISO timestamp>
+  # (inclusive) or both, the updated_at & id of the last exported row (see export_query)
+  model = EXPORTED_MODELS.get(table)
+  if model is None:
+    return apiNotFound()
+  file_format = request.args.get('format', 'csv')
+  compress = request.args.get('compress') == 'gzip'
+  try:
+    since_id = request.args.get('since_id', type=int)
+    since = request.args.get('since')
+    since = parse_datetime(since) if since else None
+  except (ValueError, OverflowError):
+    abort(400)
+  if file_format not in FORMATS:
+    abort(400)
+
+  rows = export_query(db, model, since_id=since_id, since=since, batch_size=current_app.config['EXPORT_BATCH_SIZE'])
+  filename = table + '.' + file_format + ('.gz' if compress else '')
+  response = Response(
+    stream_with_context(closing_session(rows, export_chunks(rows, model.__table__.columns.keys(), file_format, compress))),
+    mimetype='application/gzip' if compress else ('text/csv' if file_format == 'csv' else 'application/x-ndjson')
+  )
+  response.headers['Content-Disposition'] = 'attachment; filename=' + filename
+  return response
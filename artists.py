@@ -0,0 +1,160 @@
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort
+from sqlalchemy.exc import SQLAlchemyError
+from extensions import db, cache
+from genres import GENRES
+from instrumentation import query_budget
+from listing import parse_listing
+from replicas import read_only
+from models import Artist, artist_search
+
+bp = Blueprint('artists', __name__)
+
+@bp.route('/artists')
+@cache.cached('artists')
+@query_budget(2)
+def artists():
+  # ?genre=Jazz only lists the artists tagged with that genre; ?sort=name|city|upcoming, ?letter=M & ?after=<cursor>
+  # select a page of the listing (see listing.py)
+  genre = request.args.get('genre')
+  if genre and genre not in GENRES:
+    abort(400)
+  sort, limit, after, letter = parse_listing('name', current_app.config['LISTING_PAGE_SIZE'], current_app.config['LISTING_MAX_PAGE_SIZE'])
+
+  # id & name rows, not Artist instances; the total is cached
+  artists_list, next_cursor = Artist.getListing(sort=sort, limit=limit, after=after, letter=letter, genre=genre)
+  count, estimated = Artist.countListing(genre=genre)
+
+  return render_template('pages/artists.html', artists=artists_list, listing={
+    'endpoint': 'artists.artists', 'sort': sort, 'letter': letter, 'genre': genre, 'limit': limit,
+    'next_cursor': next_cursor, 'count': count, 'estimated': estimated, 'noun': 'artists'
+  })
+
+@bp.route('/artists/search', methods=['POST'])
+@read_only
+@query_budget(1)
+def search_artists():
+  
+  # ranked, prefix matching search across name, city, state & genres; the count comes from the index
+  response = artist_search.search(request.form.get('search_term', ''), limit=current_app.config['SEARCH_RESULTS_LIMIT'])
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/artists/<int:artist_id>')
+@cache.cached('artist:{artist_id}', 'venues')
+@query_budget(1)
+def show_artist(artist_id):
+  
+  # the artist & all its shows (with their venue) come from a single query,
+  # then they are split into upcoming & past shows against the same current time
+  artist_details = Artist.getDetailsWithShows(artist_id, datetime.now())
+
+  # check if artist exists, otherwise redirect to 404 page (NOT FOUND)
+  if artist_details:
+    return render_template('pages/show_artist.html', artist=artist_details)
+  else:
+    return render_template('errors/404.html')
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+# TODO - Done: populate form with fields from artist with ID <artist_id>
+
+  # WTForms is only imported by the form pages
+  from forms import ArtistForm
+  form = ArtistForm()
+  # SQL query:
+  # SELECT * FROM Artist WHERE id = artist_id
+  query_artist = Artist.query.get(artist_id)
+
+  # fill the form with the data already available, what isn't available will remain empty for the user to fill in
+  if query_artist:
+    artist_details = Artist.getDetails(query_artist)
+    form.name.data = artist_details["name"]
+    form.genres.data = artist_details["genres"]
+    form.city.data = artist_details["city"]
+    form.state.data = artist_details["state"]
+    form.phone.data = artist_details["phone"]
+    form.website.data = artist_details["website"]
+    form.facebook_link.data = artist_details["facebook_link"]
+    return render_template('forms/edit_artist.html', form=form, artist=artist_details) 
+  return render_template('errors/404.html')
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # SQL query:
+  # SELECT * FROM Artist WHERE id = artist_id
+  artist_query = Artist.query.get(artist_id)
+
+  # upating the form with the user's entered data
+  if artist_query:
+    from forms import ArtistForm
+    form = ArtistForm(request.form)
+    if not form.genres.validate(form):
+      flash('Artist ' + str(artist_id) + ' was not updated: ' + ' '.join(form.genres.errors))
+      return redirect(url_for('artists.edit_artist', artist_id=artist_id))
+    setattr(artist_query, 'name', request.form.get('name'))
+    setattr(artist_query, 'genres', request.form.getlist('genres'))
+    setattr(artist_query, 'city', request.form.get('city'))
+    setattr(artist_query, 'state', request.form.get('state'))
+    setattr(artist_query, 'website', request.form.get('website'))
+    setattr(artist_query, 'phone', request.form.get('phone'))
+    setattr(artist_query, 'facebook_link', request.form.get('facebook_link'))
+    Artist.updateArtist(artist_query)
+    # SQL query:
+    # UPDATE Artist SET 'name' = request.form.get('name'), 'genres'= request.form.getlist('genres'))...WHERE id = artist_id
+    
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+  else:
+    flash('Updating the form was not successful')
+  return render_template('errors/404.html')
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  #  modify data to be the data object returned from db insertion
+  dataFromForm = request.form
+  # an unknown genre would only fail when the row is written (GenreList raises ValueError): checked against the
+  # choices of the form first
+  from forms import ArtistForm
+  form = ArtistForm(request.form)
+  if not form.genres.validate(form):
+    flash('Artist ' + dataFromForm.get('name', '') + ' could not be listed: ' + ' '.join(form.genres.errors))
+    return render_template('forms/new_artist.html', form=form), 400
+
+  try:
+    # retrieve artist's data from the form submitted by the user 
+    newArtist = Artist(
+      name = dataFromForm.get('name'),
+      city = dataFromForm.get('city'),
+      website = dataFromForm.get('website'),
+      state = dataFromForm.get('state'),
+      phone = dataFromForm.get('phone'),
+      genres = dataFromForm.getlist('genres'),
+      image_link = dataFromForm.get('image_link'),
+      facebook_link = dataFromForm.get('facebook_link')
+    )
+    # SQL query
+    # INSERT INTO Artist (name, city, website, state, phone, genres, image_link, facebook_link) VALUES (newArtist.name, newArtist.city, newArtist.website, newArtist.state, newArtist.phone, newArtist.genres, newArtist.image_link, newArtist.facebook_link)
+    # add the new artist to the DB
+    Artist.addArtist(newArtist)
+    # on successful db insert, flash success
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    return render_template('pages/home.html')
+  except SQLAlchemyError:
+    db.session.rollback()
+    flash('An error occurred. Artist ' + dataFromForm.get('name', '') + ' could not be listed.')
+    return render_template('pages/home.html')
@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# datetime filter micro-benchmark.
+#----------------------------------------------------------------------------#
+# Compares the original `datetime` filter (dateutil parse + babel
+# format_datetime on every call) with formatting.format_datetime, rendering
+# the start times of a page of shows the way shows.html does.
+#
+#   python benchmarks/datetime_filter.py --values 300 --rounds 20
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from formatting import format_datetime, render_datetime  # noqa: E402
+
+
+def legacy_format_datetime(value, format='medium'):
+  # the filter as it was: values had to be strings, parsed again on every call
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def measure(function, values, rounds):
+  started = time.perf_counter()
+  for _ in range(rounds):
+    for value in values:
+      function(value, 'full')
+  elapsed = time.perf_counter() - started
+  return elapsed / (rounds * len(values))
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the datetime Jinja filter.')
+  parser.add_argument('--values', type=int, default=300, help='distinct start times on the page')
+  parser.add_argument('--rounds', type=int, default=20, help='times the page is rendered')
+  args = parser.parse_args()
+
+  now = datetime(2020, 9, 23, 20, 0)
+  values = [now + timedelta(hours=7 * i) for i in range(args.values)]
+  app = Flask(__name__)
+
+  with app.test_request_context('/shows'):
+    legacy = measure(legacy_format_datetime, [str(value) for value in values], args.rounds)
+    render_datetime.cache_clear()
+    cold = measure(format_datetime, values, 1)
+    warm = measure(format_datetime, values, args.rounds)
+
+  print('%-34s %10s %10s' % ('filter', 'per value', 'speedup'))
+  print('%-34s %8.1fus %9.1fx' % ('legacy (parse + format_datetime)', legacy * 1e6, 1.0))
+  print('%-34s %8.1fus %9.1fx' % ('formatting, first render', cold * 1e6, legacy / cold))
+  print('%-34s %8.1fus %9.1fx' % ('formatting, memoized', warm * 1e6, legacy / warm))
+
+
+if __name__ == '__main__':
+  main()
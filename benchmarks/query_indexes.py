@@ -0,0 +1,172 @@
+#----------------------------------------------------------------------------#
+# Show/Venue index benchmark.
+#----------------------------------------------------------------------------#
+# Seeds a synthetic catalog into a scratch database, then times the hot path
+# queries of the venue/artist detail pages and of /venues without and with the
+# indexes of the d41a7c9e2b50 migration, and captures their EXPLAIN output.
+#
+#   python benchmarks/query_indexes.py --database-url postgresql://localhost/fyyur_bench
+#   python benchmarks/query_indexes.py --shows 200000 --output bench_output.txt
+#
+# The database is dropped & recreated: never point it at real data.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.sql import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extensions import db  # noqa: E402
+# importing the models registers their tables on db.metadata
+from models import Venue, Artist, Show  # noqa: E402
+
+BENCHMARKED_INDEXES = (
+  'ix_Show_venue_id_start_time',
+  'ix_Show_artist_id_start_time',
+  'ix_Show_start_time',
+  'ix_Venue_city_state',
+)
+
+QUERIES = (
+  ('venue upcoming shows',
+   'SELECT s.id, s.start_time, a.name FROM "Show" s JOIN "Artist" a ON a.id = s.artist_id '
+   'WHERE s.venue_id = :venue_id AND s.start_time > :now'),
+  ('artist past shows',
+   'SELECT s.id, s.start_time, v.name FROM "Show" s JOIN "Venue" v ON v.id = s.venue_id '
+   'WHERE s.artist_id = :artist_id AND s.start_time <= :now'),
+  ('upcoming shows per venue',
+   'SELECT venue_id, COUNT(*) FROM "Show" WHERE start_time > :now GROUP BY venue_id'),
+  ('shows feed page',
+   'SELECT id, start_time FROM "Show" WHERE start_time > :now ORDER BY start_time, id LIMIT 30'),
+  ('venues of an area',
+   'SELECT id, name FROM "Venue" WHERE city = :city AND state = :state'),
+)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Benchmark the Show & Venue hot path queries without and with their indexes.')
+  # the scratch SQLite database goes to the temporary directory, not the working directory
+  parser.add_argument('--database-url', default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench_indexes.sqlite'))
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--shows', type=int, default=100000)
+  parser.add_argument('--repeat', type=int, default=50, help='executions of every query per phase')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--output', help='also write the report to this file')
+  return parser.parse_args()
+
+
+def seed(engine, args):
+  rng = random.Random(args.seed)
+  cities = [('City %d' % i, rng.choice(('CA', 'NY', 'TX', 'WA', 'IL'))) for i in range(max(args.venues // 20, 1))]
+  now = datetime.now()
+  with engine.begin() as connection:
+    venues = []
+    for venue_id in range(1, args.venues + 1):
+      city, state = rng.choice(cities)
+      venues.append({'id': venue_id, 'name': 'Venue %d' % venue_id, 'city': city, 'state': state})
+    connection.execute(Venue.__table__.insert(), venues)
+    connection.execute(Artist.__table__.insert(), [
+      {'id': artist_id, 'name': 'Artist %d' % artist_id} for artist_id in range(1, args.artists + 1)
+    ])
+    show_table = Show.__table__
+    batch = []
+    for show_id in range(1, args.shows + 1):
+      batch.append({
+        'id': show_id,
+        'venue_id': rng.randint(1, args.venues),
+        'artist_id': rng.randint(1, args.artists),
+        'start_time': now + timedelta(hours=rng.randint(-24 * 730, 24 * 365))
+      })
+      if len(batch) == 10000:
+        connection.execute(show_table.insert(), batch)
+        batch = []
+    if batch:
+      connection.execute(show_table.insert(), batch)
+  return cities
+
+
+def explain(connection, sql, params):
+  if connection.dialect.name == 'postgresql':
+    rows = connection.execute(text('EXPLAIN ANALYZE ' + sql), params)
+    return '\n'.join(row[0] for row in rows)
+  rows = connection.execute(text('EXPLAIN QUERY PLAN ' + sql), params)
+  return '\n'.join(str(row[-1]) for row in rows)
+
+
+def run_phase(engine, args, cities, report):
+  rng = random.Random(args.seed)
+  now = datetime.now()
+  timings = {}
+  with engine.connect() as connection:
+    # refresh the planner statistics so the plans reflect the freshly seeded data
+    connection.execute(text('ANALYZE'))
+    for name, sql in QUERIES:
+      samples = []
+      for _ in range(args.repeat):
+        city, state = rng.choice(cities)
+        params = {
+          'now': now,
+          'venue_id': rng.randint(1, args.venues),
+          'artist_id': rng.randint(1, args.artists),
+          'city': city,
+          'state': state
+        }
+        started = time.perf_counter()
+        connection.execute(text(sql), params).fetchall()
+        samples.append(time.perf_counter() - started)
+      samples.sort()
+      timings[name] = (samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1])
+      report.append('-- %s' % name)
+      report.append(explain(connection, sql, params))
+  return timings
+
+
+def main():
+  args = parse_args()
+  engine = create_engine(args.database_url)
+  db.metadata.drop_all(engine)
+  db.metadata.create_all(engine)
+
+  indexes = [index for table in db.metadata.tables.values() for index in table.indexes if index.name in BENCHMARKED_INDEXES]
+  for index in indexes:
+    index.drop(engine)
+
+  started = time.perf_counter()
+  cities = seed(engine, args)
+  report = ['seeded %d venues, %d artists, %d shows in %.1fs on %s' % (
+    args.venues, args.artists, args.shows, time.perf_counter() - started, engine.dialect.name)]
+
+  report.append('')
+  report.append('== EXPLAIN without indexes')
+  before = run_phase(engine, args, cities, report)
+
+  for index in indexes:
+    index.create(engine)
+  report.append('')
+  report.append('== EXPLAIN with indexes')
+  after = run_phase(engine, args, cities, report)
+
+  report.append('')
+  report.append('%-28s %12s %12s %12s %12s %8s' % ('query', 'p50 before', 'p50 after', 'p95 before', 'p95 after', 'speedup'))
+  for name, _ in QUERIES:
+    report.append('%-28s %10.3fms %10.3fms %10.3fms %10.3fms %7.1fx' % (
+      name, before[name][0] * 1000, after[name][0] * 1000, before[name][1] * 1000, after[name][1] * 1000,
+      before[name][0] / max(after[name][0], 1e-9)))
+
+  output = '\n'.join(report)
+  print(output)
+  if args.output:
+    with open(args.output, 'w') as report_file:
+      report_file.write(output + '\n')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,390 @@
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#----------------------------------------------------------------------------#
+# Seeds a synthetic catalog (venues, artists & shows) into a scratch database,
+# then drives every route of the app, reporting per route the p50/p95/p99
+# latency, the throughput and the SQL statements per request:
+#
+#   python benchmarks/routes.py                        # Flask test client, SQLite
+#   python benchmarks/routes.py --http --concurrency 8 # threaded HTTP server & concurrent clients
+#   python benchmarks/routes.py --database-url postgresql://localhost/fyyur_bench --venues 2000 --shows 200000
+#
+# --output writes the results as JSON (refused when a route had errors);
+# benchmarks/routes.json holds the reference run. --baseline compares a run
+# against such a file and exits with 1 when a route got slower (p95 over
+# --tolerance), runs more statements or fails more requests:
+#
+#   python benchmarks/routes.py --baseline benchmarks/routes.json
+#
+# Latencies are only comparable between runs of the same machine, catalog &
+# mode: compare against a baseline recorded with the same options.
+#
+# The database is dropped & recreated: never point it at real data.
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+GENRES = ('Jazz', 'Rock n Roll', 'Pop', 'Blues', 'Folk', 'Classical', 'Electronic', 'Hip-Hop')
+WORDS = ('Blue', 'Red', 'Old', 'Golden', 'Velvet', 'Iron', 'Silver', 'Night', 'Park', 'Hall', 'Club', 'Room')
+CITIES = (('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Seattle', 'WA'), ('Chicago', 'IL'))
+
+
+#  Catalog
+#  ----------------------------------------------------------------
+
+def seed(db, models, venues, artists, shows, disposable):
+  # bulk inserts: a catalog of 100k shows takes seconds, not minutes
+  rng = random.Random(42)
+  now = datetime.now()
+
+  def entity(number, kind):
+    city, state = CITIES[number % len(CITIES)]
+    return {
+      'name': '%s %s %s %d' % (rng.choice(WORDS), rng.choice(WORDS), kind, number),
+      'genres': rng.sample(GENRES, rng.randint(1, 3)),
+      'city': city, 'state': state, 'phone': '555-555-5555', 'website': 'https://example.com',
+      'image_link': 'https://example.com/image.jpg', 'facebook_link': 'https://facebook.com/example'
+    }
+
+  venue_rows = [dict(entity(number, 'Venue'), address='%d Main St' % number) for number in range(venues + disposable)]
+  db.session.execute(db.insert(models.Venue), venue_rows)
+  db.session.execute(db.insert(models.Artist), [entity(number, 'Band') for number in range(artists)])
+  # the disposable venues (no shows) are the ones the DELETE route removes
+  venue_ids = db.session.scalars(db.select(models.Venue.id).order_by(models.Venue.id)).all()
+  artist_ids = db.session.scalars(db.select(models.Artist.id)).all()
+  booked, disposable_ids = venue_ids[:venues], venue_ids[venues:]
+  batch = []
+  for number in range(shows):
+    # half of the shows are past, half upcoming, within a year of now
+    batch.append({
+      'venue_id': rng.choice(booked),
+      'artist_id': rng.choice(artist_ids),
+      'start_time': now + timedelta(minutes=rng.randint(-365 * 24 * 60, 365 * 24 * 60))
+    })
+    if len(batch) == 10000:
+      db.session.execute(db.insert(models.Show), batch)
+      batch = []
+  if batch:
+    db.session.execute(db.insert(models.Show), batch)
+  db.session.commit()
+  models.ShowCounters.reconcile(now)
+  return booked, artist_ids, disposable_ids
+
+
+#  Routes
+#  ----------------------------------------------------------------
+
+def scenarios(venue_ids, artist_ids, disposable_ids):
+  # endpoint -> function returning (method, path, form, json) for the next request; the endpoints of the app
+  # missing from here are reported, so that a new route gets a scenario
+  rng = random.Random(7)
+  sequence = itertools.count()
+  disposable = iter(disposable_ids)
+  # far in the future, a week apart, so that the shows created never double book a venue
+  future = lambda: (datetime(2100, 1, 1) + timedelta(days=7 * next(sequence))).strftime('%Y-%m-%d %H:%M')
+  venue = lambda: rng.choice(venue_ids)
+  artist = lambda: rng.choice(artist_ids)
+  entity_form = lambda kind: {
+    'name': 'Benchmark %s %d' % (kind, next(sequence)), 'genres': 'Jazz', 'city': 'Austin', 'state': 'TX',
+    'address': '1 Benchmark Rd', 'phone': '555-555-5555', 'website': 'https://example.com',
+    'image_link': 'https://example.com/image.jpg', 'facebook_link': 'https://facebook.com/example'
+  }
+  get = lambda path: lambda: ('GET', path() if callable(path) else path, None, None)
+  post = lambda path, form=None, json=None: lambda: (
+    'POST', path() if callable(path) else path, form() if form else None, json() if json else None)
+  return {
+    'index': get('/'),
+    'cache_stats': get('/cache/stats'),
+    'metrics': get('/metrics'),
+    'venues.venues': get('/venues'),
+    'venues.search_venues': post('/venues/search', lambda: {'search_term': rng.choice(WORDS + ('san', 'jazz'))}),
+    'venues.show_venue': get(lambda: '/venues/%d' % venue()),
+    'venues.create_venue_form': get('/venues/create'),
+    'venues.create_venue_submission': post('/venues/create', lambda: entity_form('Venue')),
+    'venues.delete_venue': lambda: ('DELETE', '/venues/%d' % next(disposable), None, None),
+    'venues.edit_venue': get(lambda: '/venues/%d/edit' % venue()),
+    'venues.edit_venue_submission': post(lambda: '/venues/%d/edit' % venue(), lambda: entity_form('Venue')),
+    'artists.artists': get('/artists'),
+    'artists.search_artists': post('/artists/search', lambda: {'search_term': rng.choice(WORDS + ('band', 'rock'))}),
+    'artists.show_artist': get(lambda: '/artists/%d' % artist()),
+    'artists.create_artist_form': get('/artists/create'),
+    'artists.create_artist_submission': post('/artists/create', lambda: entity_form('Band')),
+    'artists.edit_artist': get(lambda: '/artists/%d/edit' % artist()),
+    'artists.edit_artist_submission': post(lambda: '/artists/%d/edit' % artist(), lambda: entity_form('Band')),
+    'shows.shows': get('/shows'),
+    'shows.create_shows': get('/shows/create'),
+    'shows.create_show_submission': post('/shows/create', lambda: {
+      'venue_id': str(venue()), 'artist_id': str(artist()), 'start_time': future()}),
+    'shows.create_show_batch': get('/shows/batch'),
+    'shows.create_show_batch_submission': post('/shows/batch', lambda: {'shows': '\n'.join(
+      '%d, %d, %s' % (artist(), venue(), future()) for _ in range(10))}),
+    'api.api_venues': get('/api/v1/venues'),
+    'api.api_artists': get('/api/v1/artists'),
+    'api.api_shows': get('/api/v1/shows'),
+    'api.api_schedule_shows': post('/api/v1/shows', json=lambda: {'shows': [
+      {'venue_id': venue(), 'artist_id': artist(), 'start_time': future()} for _ in range(10)]}),
+    'api.api_show_venue': get(lambda: '/api/v1/venues/%d' % venue()),
+    'api.api_show_artist': get(lambda: '/api/v1/artists/%d' % artist()),
+    'api.api_show_show': get(lambda: '/api/v1/shows/%d' % rng.randint(1, 100)),
+    'api.api_export': get('/api/v1/export/shows?format=csv'),
+    'api.api_autocomplete': get(lambda: '/api/v1/autocomplete/%s?q=%s' % (
+      rng.choice(('venues', 'artists')), rng.choice(WORDS)[:rng.randint(1, 4)].lower())),
+  }
+
+
+#  Drivers
+#  ----------------------------------------------------------------
+
+class StatementCounter(object):
+  # SQL statements per endpoint, counted in the request that runs them (whatever thread serves it)
+
+  def __init__(self, engine):
+    from flask import has_request_context, request
+    from sqlalchemy import event
+    self.counts = {}
+    self.lock = threading.Lock()
+
+    def count(*args):
+      if has_request_context():
+        with self.lock:
+          self.counts[request.endpoint] = self.counts.get(request.endpoint, 0) + 1
+    event.listen(engine, 'before_cursor_execute', count)
+
+  def take(self, endpoint):
+    with self.lock:
+      return self.counts.pop(endpoint, 0)
+
+
+def client_request(client, request):
+  method, path, form, json_body = request
+  # closing the response tears the streamed ones down, returning their connection to the pool
+  with client.open(path, method=method, data=form, json=json_body) as response:
+    response.get_data()
+    return response.status_code
+
+
+class HTTPDriver(object):
+  # a threaded server in this process; a keep-alive connection per client thread
+
+  def __init__(self, app):
+    from werkzeug.serving import make_server
+    self.server = make_server('127.0.0.1', 0, app, threaded=True)
+    self.server.RequestHandlerClass.protocol_version = 'HTTP/1.1'
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    self.local = threading.local()
+
+  def request(self, request):
+    method, path, form, json_body = request
+    headers, body = {}, None
+    if form is not None:
+      headers['Content-Type'] = 'application/x-www-form-urlencoded'
+      body = urlencode(form)
+    elif json_body is not None:
+      headers['Content-Type'] = 'application/json'
+      body = json.dumps(json_body)
+    for attempt in (1, 2):
+      connection = getattr(self.local, 'connection', None)
+      if connection is None:
+        connection = self.local.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+      try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+      except (http.client.HTTPException, ConnectionError):
+        # the server closed the keep-alive connection
+        connection.close()
+        self.local.connection = None
+        if attempt == 2:
+          raise
+
+  def close(self):
+    self.server.shutdown()
+
+
+def percentile(values, fraction):
+  # nearest rank
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def benchmark(send, scenario, requests, concurrency):
+  errors = [0]
+
+  def timed(request):
+    started = time.perf_counter()
+    try:
+      status = send(request)
+    except Exception:
+      status = None
+    elapsed = time.perf_counter() - started
+    if status is None or status >= 400:
+      errors[0] += 1
+    return elapsed
+
+  # the requests are built up front, their random ids & form data don't count in the latency
+  batch = [scenario() for _ in range(requests)]
+  started = time.perf_counter()
+  if concurrency == 1:
+    latencies = [timed(request) for request in batch]
+  else:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+      latencies = list(pool.map(timed, batch))
+  elapsed = time.perf_counter() - started
+  return {
+    'requests': requests,
+    'errors': errors[0],
+    'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+    'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+    'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    'requests_per_second': round(requests / elapsed, 1),
+  }
+
+
+#  Comparison
+#  ----------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+  # a route regressed when its p95 grew by more than tolerance (0.25: 25%), it runs more statements per request
+  # or more of its requests fail (a route failing fast would look faster)
+  regressions = []
+  print('\n%-40s %10s %10s %8s %12s %10s' % ('route', 'p95 base', 'p95 now', 'change', 'statements', 'errors'))
+  for endpoint, now in sorted(results['routes'].items()):
+    before = baseline['routes'].get(endpoint)
+    if before is None:
+      print('%-40s %10s %8.2fms %8s %12s %10s' % (endpoint, 'new', now['p95_ms'], '', now['statements_per_request'], now['errors']))
+      if now['errors']:
+        regressions.append(endpoint)
+      continue
+    change = now['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+    statements = '%s -> %s' % (before['statements_per_request'], now['statements_per_request'])
+    errors = '%s -> %s' % (before['errors'], now['errors'])
+    regressed = (change > tolerance or now['statements_per_request'] > before['statements_per_request']
+      or now['errors'] > before['errors'])
+    print('%-40s %8.2fms %8.2fms %+7.0f%% %12s %10s%s' % (
+      endpoint, before['p95_ms'], now['p95_ms'], change * 100, statements, errors, '  REGRESSION' if regressed else ''))
+    if regressed:
+      regressions.append(endpoint)
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark every route of the app.')
+  parser.add_argument('--database-url', help='scratch database, dropped & recreated (default: a temporary SQLite file)')
+  parser.add_argument('--venues', type=int, default=200)
+  parser.add_argument('--artists', type=int, default=500)
+  parser.add_argument('--shows', type=int, default=10000)
+  parser.add_argument('--requests', type=int, default=200, help='measured requests per route')
+  parser.add_argument('--warmup', type=int, default=5, help='requests per route before measuring')
+  parser.add_argument('--http', action='store_true', help='go through a threaded HTTP server instead of the test client')
+  parser.add_argument('--concurrency', type=int, default=1, help='concurrent clients (with --http)')
+  parser.add_argument('--cache', default='null', help="CACHE_BACKEND of the app: 'null' measures the uncached pages")
+  parser.add_argument('--routes', help='comma separated endpoints to benchmark, e.g. venues.venues,shows.shows')
+  parser.add_argument('--verbose', action='store_true', help='log the errors of the app')
+  parser.add_argument('--output', help='write the results to this JSON file')
+  parser.add_argument('--baseline', help='compare with the results of an earlier run')
+  parser.add_argument('--tolerance', type=float, default=0.25, help='p95 growth tolerated by --baseline')
+  args = parser.parse_args()
+  if args.concurrency > 1 and not args.http:
+    parser.error('--concurrency needs --http')
+
+  database = args.database_url or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_routes.sqlite')
+  # the settings are read when config.py is imported; production settings, without its statement timeout
+  os.environ.update({
+    'FYYUR_CONFIG': 'production', 'DATABASE_URL': database, 'SECRET_KEY': 'benchmark',
+    'CACHE_BACKEND': args.cache, 'JOBS_BACKEND': 'sync', 'DB_STATEMENT_TIMEOUT_MS': '0',
+    'LOG_FILE': os.path.join(tempfile.gettempdir(), 'fyyur_routes.log'),
+  })
+  from app import create_app
+  from extensions import db
+  import models
+
+  app = create_app()
+  app.config['WTF_CSRF_ENABLED'] = False
+  if not args.verbose:
+    # the failed requests are counted per route, not logged with their traceback
+    logging.getLogger(app.name).setLevel(logging.CRITICAL)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+  with app.app_context():
+    print('seeding %d venues, %d artists & %d shows into %s' % (
+      args.venues, args.artists, args.shows, db.engine.url.render_as_string(hide_password=True)))
+    db.drop_all()
+    db.create_all()
+    venue_ids, artist_ids, disposable_ids = seed(db, models, args.venues, args.artists, args.shows,
+      disposable=args.warmup + args.requests)
+    counter = StatementCounter(db.engine)
+    dialect = db.engine.dialect.name
+
+  routes = scenarios(venue_ids, artist_ids, disposable_ids)
+  endpoints = set(rule.endpoint for rule in app.url_map.iter_rules()) - {'static'}
+  missing = sorted(endpoints - set(routes))
+  if missing:
+    print('no scenario for: %s' % ', '.join(missing))
+  selected = sorted(endpoints & set(routes))
+  if args.routes:
+    selected = [endpoint for endpoint in selected if endpoint in args.routes.split(',')]
+
+  if args.http:
+    driver = HTTPDriver(app)
+    send = driver.request
+  else:
+    client = app.test_client()
+    send = lambda request: client_request(client, request)
+
+  results = {
+    'python': platform.python_version(),
+    'database': dialect,
+    'catalog': {'venues': args.venues, 'artists': args.artists, 'shows': args.shows},
+    'mode': 'http' if args.http else 'test_client',
+    'concurrency': args.concurrency,
+    'cache': args.cache,
+    'routes': {},
+  }
+  print('%-40s %9s %9s %9s %9s %7s %6s' % ('route', 'p50', 'p95', 'p99', 'req/s', 'stmts', 'errors'))
+  for endpoint in selected:
+    for _ in range(args.warmup):
+      send(routes[endpoint]())
+    counter.take(endpoint)
+    route = benchmark(send, routes[endpoint], args.requests, args.concurrency)
+    route['statements_per_request'] = round(counter.take(endpoint) / float(args.requests), 1)
+    results['routes'][endpoint] = route
+    print('%-40s %7.2fms %7.2fms %7.2fms %9.1f %7s %6d' % (endpoint, route['p50_ms'], route['p95_ms'], route['p99_ms'],
+      route['requests_per_second'], route['statements_per_request'], route['errors']))
+  if args.http:
+    driver.close()
+
+  failing = sorted(endpoint for endpoint, route in results['routes'].items() if route['errors'])
+  if args.output and failing:
+    # a baseline must not record failures as the expected behaviour
+    print('\nnot writing %s, requests failed on: %s' % (args.output, ', '.join(failing)))
+    sys.exit(1)
+  if args.output:
+    with open(args.output, 'w') as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+      output.write('\n')
+  if args.baseline:
+    with open(args.baseline) as baseline:
+      regressions = compare(results, json.load(baseline), args.tolerance)
+    if regressions:
+      print('\n%d routes regressed: %s' % (len(regressions), ', '.join(regressions)))
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,88 @@
+#----------------------------------------------------------------------------#
+# Startup benchmark.
+#----------------------------------------------------------------------------#
+# Measures what a new worker pays before serving: importing app.py, building
+# the application and answering its first request (the home page), in fresh
+# interpreters, and which heavy libraries are loaded by then. The results of
+# a run are written with --output; benchmarks/startup.json holds the reference
+# numbers, compare a new run against it after touching the imports.
+#
+#   python benchmarks/startup.py --runs 10 --output benchmarks/startup.json
+#
+# --root runs the same measure on another checkout (e.g. a `git worktree` of
+# an older commit), which may still build the app at import time.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+HEAVY_MODULES = ('wtforms', 'flask_wtf', 'babel', 'dateutil')
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+create_app = getattr(module, 'create_app', None)
+application = create_app() if create_app else module.app
+created = time.perf_counter()
+response = application.test_client().get('/')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+  'import_ms': (imported - started) * 1000,
+  'create_app_ms': (created - imported) * 1000,
+  'first_request_ms': (served - created) * 1000,
+  'total_ms': (served - started) * 1000,
+  'modules': len(sys.modules),
+  'heavy_modules': sorted(name for name in %r if name in sys.modules),
+}))
+''' % (HEAVY_MODULES,)
+
+
+def run_once(root, database):
+  environment = dict(os.environ, DATABASE_URL=database, FYYUR_CONFIG='development', PYTHONDONTWRITEBYTECODE='1')
+  output = subprocess.check_output([sys.executable, '-c', CHILD], cwd=root, env=environment)
+  return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the startup of a worker.')
+  parser.add_argument('--runs', type=int, default=10, help='fresh interpreters started')
+  parser.add_argument('--root', default=ROOT, help='checkout to measure')
+  parser.add_argument('--output', help='write the results to this JSON file')
+  args = parser.parse_args()
+
+  # the app only connects to the database on the first query, the home page doesn't run any
+  database = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_startup.sqlite')
+  runs = [run_once(os.path.abspath(args.root), database) for _ in range(args.runs)]
+
+  results = {
+    'python': platform.python_version(),
+    'runs': args.runs,
+    'heavy_modules_loaded': runs[-1]['heavy_modules'],
+    'modules_loaded': runs[-1]['modules'],
+  }
+  print('%-18s %10s %10s' % ('phase', 'median', 'min'))
+  for phase in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+    values = [run[phase] for run in runs]
+    results[phase] = {'median': round(statistics.median(values), 1), 'min': round(min(values), 1)}
+    print('%-18s %8.1fms %8.1fms' % (phase, results[phase]['median'], results[phase]['min']))
+  print('modules loaded after the first request: %d, heavy ones: %s' % (
+    results['modules_loaded'], ', '.join(results['heavy_modules_loaded']) or 'none'))
+
+  if args.output:
+    with open(args.output, 'w') as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+      output.write('\n')
+
+
+if __name__ == '__main__':
+  main()
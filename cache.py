@@ -0,0 +1,327 @@
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+# Caches the rendered responses of the read-heavy pages.
+#
+# Every cached view declares the namespaces its content depends on (e.g. the
+# venue page depends on 'venue:<id>' & on 'artists' because it shows artist
+# names). Each namespace has a version token stored in the backend and the
+# tokens are part of the cache key, so invalidating a namespace is a single
+# write of a new token: the entries built with the old token are never read
+# again and simply age out (TTL / LRU eviction), no key scanning is needed.
+#
+# Backends:
+#   'lru'    - bounded in-process LRU (default)
+#   'shared' - any client with get(key) / set(key, value, ex=ttl) / delete(key),
+#              e.g. redis.Redis(); DictServer is a local stand-in
+#   'null'   - caching disabled
+#
+# Templates also cache fragments, e.g. the tile of every venue of a listing:
+#
+#   {% cache 'venue:%d' % venue.id %} ... {% endcache %}
+#
+# renders the block once per version of the namespace(s) (a string or a list)
+# and display variant, so a listing page rebuilt after one venue changed only
+# renders that venue's tile again. {% cache key, 300 %} sets the TTL.
+#
+# The 'lru' versions only see the invalidations of their own process, so the
+# fragments & values live CACHE_FRAGMENT_TTL with the 'shared' backend only,
+# CACHE_DEFAULT_TTL (as the pages) otherwise.
+#
+# A version token carries the time it was set: what a request reads from a
+# read replica (see replicas.py) less than REPLICA_STICKY_SECONDS after a
+# namespace changed may predate the change, so it is served but not cached
+# under the new version.
+
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, has_app_context, has_request_context, request, session, make_response, Response
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class NullBackend(object):
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value, ttl=None):
+    pass
+
+  def delete(self, key):
+    pass
+
+
+class LRUBackend(object):
+
+  def __init__(self, max_entries=1024):
+    self.max_entries = max_entries
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      value, expires_at = entry
+      if expires_at is not None and expires_at <= time.time():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    expires_at = time.time() + ttl if ttl else None
+    with self.lock:
+      self.entries[key] = (value, expires_at)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def delete(self, key):
+    with self.lock:
+      self.entries.pop(key, None)
+
+
+class DictServer(object):
+  # local stand-in for a shared key/value server (same get/set/delete calls as redis.Redis)
+
+  def __init__(self):
+    self.data = {}
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.data.get(key)
+      if entry is None:
+        return None
+      value, expires_at = entry
+      if expires_at is not None and expires_at <= time.time():
+        del self.data[key]
+        return None
+      return value
+
+  def set(self, key, value, ex=None):
+    with self.lock:
+      self.data[key] = (value, time.time() + ex if ex else None)
+    return True
+
+  def delete(self, key):
+    with self.lock:
+      return 1 if self.data.pop(key, None) is not None else 0
+
+
+class SharedBackend(object):
+  # values are pickled so that any bytes-oriented key/value server can store them
+
+  def __init__(self, client, prefix='fyyur:'):
+    self.client = client
+    self.prefix = prefix
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return None if value is None else pickle.loads(value)
+
+  def set(self, key, value, ttl=None):
+    self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=ttl or None)
+
+  def delete(self, key):
+    self.client.delete(self.prefix + key)
+
+
+class FragmentCacheExtension(Extension):
+  # the {% cache %} tag, see above
+  tags = {'cache'}
+
+  def parse(self, parser):
+    lineno = next(parser.stream).lineno
+    # the template & line of the tag tell apart two fragments keyed on the same namespace
+    args = [nodes.Const('%s:%d' % (parser.name, lineno)), parser.parse_expression()]
+    args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None))
+    body = parser.parse_statements(['name:endcache'], drop_needle=True)
+    return nodes.CallBlock(self.call_method('render_fragment', args), [], [], body).set_lineno(lineno)
+
+  def render_fragment(self, position, namespaces, ttl, caller):
+    return self.environment.response_cache.fragment(position, namespaces, ttl, caller)
+
+
+def new_token():
+  # 'random@unix time'
+  return '%s@%d' % (uuid.uuid4().hex[:12], time.time())
+
+
+def token_age(token):
+  # seconds since the version was set, None for a token without a time
+  _, _, stamp = token.partition('@')
+  return time.time() - int(stamp) if stamp.isdigit() else None
+
+
+class ResponseCache(object):
+
+  def __init__(self, app=None):
+    self.backend = NullBackend()
+    self.default_ttl = 60
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.fragments = NullBackend()
+    self.fragment_ttl = 3600
+    self.value_ttl = 60
+    self.replica_lag = 10
+    self.fragment_hits = 0
+    self.fragment_misses = 0
+    # functions of the request whose results change the rendered page (e.g. the display locale)
+    self.variants = []
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    backend = app.config.get('CACHE_BACKEND', 'lru')
+    if backend == 'lru':
+      self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+    elif backend == 'shared':
+      client = app.config.get('CACHE_SHARED_CLIENT')
+      self.backend = SharedBackend(client() if callable(client) else (client or DictServer()))
+    elif backend == 'null':
+      self.backend = NullBackend()
+    else:
+      raise ValueError('Unknown CACHE_BACKEND %r' % backend)
+    self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+    # the fragments of a big listing would evict the pages from a shared LRU
+    self.fragments = LRUBackend(app.config.get('CACHE_FRAGMENT_MAX_ENTRIES', 10000)) if backend == 'lru' else self.backend
+    # the 'lru' versions only see the invalidations of this process: a fragment or a value computed from the
+    # database (e.g. the count of a listing) goes stale when another process writes, so it lives as long as the pages
+    self.fragment_ttl = app.config.get('CACHE_FRAGMENT_TTL', 3600) if backend == 'shared' else self.default_ttl
+    self.value_ttl = self.fragment_ttl
+    self.replica_lag = app.config.get('REPLICA_STICKY_SECONDS', 10)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.response_cache = self
+    app.extensions['response_cache'] = self
+
+  def vary_on(self, variant):
+    self.variants.append(variant)
+    return variant
+
+  def version(self, namespace):
+    key = 'ns:' + namespace
+    token = self.backend.get(key)
+    if token is None:
+      # a missing (never set or evicted) version gets a fresh token, so old entries can't come back
+      token = new_token()
+      self.backend.set(key, token)
+    return token
+
+  def invalidate(self, *namespaces):
+    for namespace in namespaces:
+      self.backend.set('ns:' + namespace, new_token())
+    if has_app_context():
+      g.pop('fragment_cache', None)
+
+  def storable(self, tokens):
+    # False when the request reads from a replica that may not have caught up with one of these versions yet
+    if not has_request_context() or g.get('db_replica') is None:
+      return True
+    ages = [token_age(token) for token in tokens]
+    return not any(age is not None and age < self.replica_lag for age in ages)
+
+  def count(self, hit, fragment=False):
+    with self.lock:
+      if fragment:
+        if hit:
+          self.fragment_hits += 1
+        else:
+          self.fragment_misses += 1
+      elif hit:
+        self.hits += 1
+      else:
+        self.misses += 1
+
+  def stats(self):
+    with self.lock:
+      hits, misses = self.hits, self.misses
+      fragment_hits, fragment_misses = self.fragment_hits, self.fragment_misses
+    total = hits + misses
+    return {
+      'backend': type(self.backend).__name__,
+      'hits': hits,
+      'misses': misses,
+      'hit_ratio': float(hits) / total if total else 0.0,
+      'fragment_hits': fragment_hits,
+      'fragment_misses': fragment_misses
+    }
+
+  def value(self, name, namespaces, compute, ttl=None):
+    # a value computed from the database once per version of the namespaces, e.g. the count of a listing
+    if isinstance(self.backend, NullBackend):
+      return compute()
+    tokens = [self.version(namespace) for namespace in namespaces]
+    key = 'value:%s|%s' % (name, ','.join(tokens))
+    value = self.backend.get(key)
+    if value is None:
+      value = compute()
+      if self.storable(tokens):
+        self.backend.set(key, value, ttl or self.value_ttl)
+    return value
+
+  def fragment(self, position, namespaces, ttl, render):
+    if isinstance(self.fragments, NullBackend):
+      return render()
+    if isinstance(namespaces, str):
+      namespaces = [namespaces]
+    # the versions are read from the backend, so that every process sees the invalidations; a listing reads
+    # the same ones for many tiles (e.g. the venue of several shows), the variants are the same for all of them
+    memo = g.setdefault('fragment_cache', {})
+    if 'variants' not in memo:
+      memo['variants'] = ','.join(str(variant()) for variant in self.variants)
+    versions = []
+    for namespace in namespaces:
+      if namespace not in memo:
+        memo[namespace] = self.version(namespace)
+      versions.append(namespace + '=' + memo[namespace])
+    key = 'fragment:%s|%s|%s' % (position, ','.join(versions), memo['variants'])
+    fragment = self.fragments.get(key)
+    self.count(fragment is not None, fragment=True)
+    if fragment is None:
+      fragment = render()
+      if self.storable([memo[namespace] for namespace in namespaces]):
+        self.fragments.set(key, str(fragment), ttl or self.fragment_ttl)
+    return Markup(fragment)
+
+  def cached(self, *namespaces, **options):
+    # namespaces may refer to the view arguments, e.g. @cache.cached('venue:{venue_id}', 'artists')
+    ttl = options.get('ttl')
+
+    def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+        # never cache a write, nor a page that will display flashed messages of this session only
+        if request.method != 'GET' or session.get('_flashes') or isinstance(self.backend, NullBackend):
+          return view(*args, **kwargs)
+
+        tokens = [self.version(namespace.format(**kwargs)) for namespace in namespaces]
+        variants = ','.join(str(variant()) for variant in self.variants)
+        key = 'view:%s?%s|%s|%s' % (
+          request.path, '&'.join(sorted(request.query_string.decode('utf-8').split('&'))), ','.join(tokens), variants)
+        entry = self.backend.get(key)
+        if entry is not None:
+          self.count(True)
+          body, status, content_type = entry
+          response = Response(body, status=status, content_type=content_type)
+          response.headers['X-Cache'] = 'HIT'
+          return response
+
+        self.count(False)
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough and self.storable(tokens):
+          self.backend.set(key, (response.get_data(), response.status_code, response.content_type), ttl or self.default_ttl)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+      return wrapper
+    return decorator
@@ -0,0 +1,130 @@
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+# `flask import`, `flask export`, `flask counters` & `flask jobs`, registered on the app by create_app().
+
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from extensions import db, cache, jobs
+from importer import Importer, read_records, detect_format
+from exporter import FORMATS, export_query, export_chunks
+from models import Venue, Artist, Show, ShowCounters, venue_search, artist_search
+from api import EXPORTED_MODELS
+
+# the resume point printed by `flask export` has microseconds on PostgreSQL
+EXPORT_TIME_FORMATS = ('%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S.%f')
+
+def showReferencesExist(rows):
+  # SQL queries:
+  # SELECT id FROM Venue WHERE id IN (venue ids of the batch), same for the artists
+  venue_ids = set(row['venue_id'] for row in rows)
+  artist_ids = set(row['artist_id'] for row in rows)
+  known_venues = set(venue_id for venue_id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids)))
+  known_artists = set(artist_id for artist_id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids)))
+  return lambda row: row['venue_id'] in known_venues and row['artist_id'] in known_artists
+
+@click.command('import')
+@with_appcontext
+@click.argument('table', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows inserted & committed together.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Progress file, an interrupted import resumes from it.')
+@click.option('--rejects', type=click.File('w'), help='Write the rejected rows & their errors to this JSONL file.')
+@click.option('--copy/--no-copy', 'use_copy', default=True, show_default=True, help='Use COPY on PostgreSQL.')
+def import_command(table, path, file_format, batch_size, checkpoint, rejects, use_copy):
+  """Bulk import venues, artists or shows from a CSV or JSONL file."""
+  from forms import VenueForm, ArtistForm, ShowForm
+  model, form_class = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm)
+  }[table]
+  importer = Importer(db, model, form_class, table,
+    batch_size=batch_size,
+    use_copy=use_copy,
+    echo=click.echo,
+    rejects=rejects,
+    exists=showReferencesExist if table == 'shows' else None)
+  importer.run(read_records(path, file_format or detect_format(path)), checkpoint=checkpoint)
+
+  # the rows didn't go through addVenue/addArtist/addShow. This only resets the caches of this process & of the
+  # 'shared' cache backend: the web workers' in-memory search indexes notice the new rows within
+  # SEARCH_INDEX_CHECK_INTERVAL (see search.py), their 'lru' caches keep the pages up to CACHE_DEFAULT_TTL
+  venue_search.reset()
+  artist_search.reset()
+  cache.invalidate('venues', 'artists', 'shows')
+  if table == 'shows':
+    ShowCounters.reconcile(datetime.now())
+
+@click.command('export')
+@with_appcontext
+@click.argument('table', type=click.Choice(sorted(EXPORTED_MODELS)))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Defaults to the standard output.')
+@click.option('--since-id', type=int, help='Only export the rows with a greater id, or with --since, the rows of that time with a greater id.')
+@click.option('--since', type=click.DateTime(formats=EXPORT_TIME_FORMATS),
+  help='Only export the rows added or changed at or after this time.')
+def export_command(table, file_format, compress, output, since_id, since):
+  """Stream a table to CSV or JSONL, whole or incrementally."""
+  model = EXPORTED_MODELS[table]
+  exported = {'rows': 0, 'resume': None}
+
+  def tracked(rows):
+    for row in rows:
+      exported['rows'] += 1
+      # the greatest (updated_at, id) exported, the keyset the next export starts after
+      if exported['resume'] is None or (row.updated_at, row.id) > exported['resume']:
+        exported['resume'] = (row.updated_at, row.id)
+      yield row
+
+  rows = tracked(export_query(db, model, since_id=since_id, since=since, batch_size=current_app.config['EXPORT_BATCH_SIZE']))
+  with click.open_file(output or '-', 'wb') as destination:
+    for chunk in export_chunks(rows, model.__table__.columns.keys(), file_format, compress):
+      destination.write(chunk)
+  # on stderr so that it never ends up in the exported data
+  if exported['resume'] is None:
+    click.echo('exported 0 rows', err=True)
+  else:
+    click.echo('exported %d rows, next time: --since %s --since-id %d' % (
+      exported['rows'], exported['resume'][0].isoformat(), exported['resume'][1]), err=True)
+
+@click.group('counters')
+def counters_command():
+  """Maintain the upcoming & past show counters of the venues & artists."""
+
+@counters_command.command('roll')
+@with_appcontext
+def roll_counters_command():
+  """Move the shows that started since the last run from upcoming to past (run it every minute)."""
+  updated = ShowCounters.rollForward(datetime.now())
+  click.echo('counters of %d venues & artists rolled forward' % updated)
+
+@counters_command.command('reconcile')
+@with_appcontext
+def reconcile_counters_command():
+  """Recount the counters of every venue & artist from the shows."""
+  updated = ShowCounters.reconcile(datetime.now())
+  click.echo('counters of %d venues & artists fixed' % updated)
+
+@click.group('jobs')
+def jobs_command():
+  """Run the background jobs of the 'database' backend."""
+
+@jobs_command.command('worker')
+@with_appcontext
+@click.option('--poll', 'poll_interval', default=1.0, show_default=True, help='Seconds between two looks at an empty queue.')
+@click.option('--once', is_flag=True, help='Stop when no job is due instead of waiting for more.')
+def jobs_worker_command(poll_interval, once):
+  """Run the queued jobs, retrying the failed ones."""
+  jobs.work(poll_interval=poll_interval, once=once, echo=click.echo)
+
+@jobs_command.command('purge')
+@with_appcontext
+@click.option('--days', default=7, show_default=True, help='Delete the jobs done more than this many days ago.')
+def jobs_purge_command(days):
+  """Delete the old done jobs (their idempotency keys can be queued again)."""
+  click.echo('%d jobs purged' % jobs.purge(datetime.now() - timedelta(days=days)))
@@ -1,13 +1,188 @@
 import os
-SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# The configuration is picked with the FYYUR_CONFIG environment variable:
+# 'development' (default), 'test' or 'production'. Settings that change between
+# deployments are read from the environment, e.g.
+#   $ export FYYUR_CONFIG=production
+#   $ export DATABASE_URL=postgresql://fyyur@db:5432/fyyur_db
+#   $ export SECRET_KEY=...  # the same for every worker, or their sessions & CSRF tokens don't validate
 
-# Connect to the database
 
+def env(name, default=None, cast=str):
+  value = os.environ.get(name)
+  if value is None or value == '':
+    return default
+  if cast is bool:
+    return value.lower() in ('1', 'true', 'yes', 'on')
+  return cast(value)
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://Paulo@localhost:5432/fyyur_db'
+
+def database_url(url):
+  # SQLAlchemy only accepts the postgresql:// scheme, Heroku & co. hand out postgres:// URLs
+  if url.startswith('postgres://'):
+    return 'postgresql://' + url[len('postgres://'):]
+  return url
+
+
+class Config(object):
+  DEBUG = False
+  TESTING = False
+  SECRET_KEY = env('SECRET_KEY')
+
+  # Connect to the database
+  SQLALCHEMY_DATABASE_URI = database_url(env('DATABASE_URL', 'postgresql://Paulo@localhost:5432/fyyur_db'))
+  SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+  # Connection pool of every process: with gunicorn the database sees up to
+  # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections, keep it under max_connections
+  DB_POOL_SIZE = env('DB_POOL_SIZE', 5, int)
+  DB_MAX_OVERFLOW = env('DB_MAX_OVERFLOW', 5, int)
+  # seconds to wait for a connection when the pool & overflow are all checked out
+  DB_POOL_TIMEOUT = env('DB_POOL_TIMEOUT', 10, int)
+  # connections are replaced after this many seconds, before the server or a proxy drops them
+  DB_POOL_RECYCLE = env('DB_POOL_RECYCLE', 1800, int)
+  # checks a connection with a cheap round trip when it is checked out of the pool
+  DB_POOL_PRE_PING = env('DB_POOL_PRE_PING', True, bool)
+  # PostgreSQL cancels the statements running longer than this (0: no limit)
+  DB_STATEMENT_TIMEOUT_MS = env('DB_STATEMENT_TIMEOUT_MS', 0, int)
+
+  @property
+  def SQLALCHEMY_ENGINE_OPTIONS(self):
+    if self.SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+      # SQLite doesn't pool connections across threads
+      return {}
+    options = {
+      'pool_size': self.DB_POOL_SIZE,
+      'max_overflow': self.DB_MAX_OVERFLOW,
+      'pool_timeout': self.DB_POOL_TIMEOUT,
+      'pool_recycle': self.DB_POOL_RECYCLE,
+      'pool_pre_ping': self.DB_POOL_PRE_PING,
+    }
+    if self.DB_STATEMENT_TIMEOUT_MS and self.SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+      options['connect_args'] = {'options': '-c statement_timeout=%d' % self.DB_STATEMENT_TIMEOUT_MS}
+    return options
+
+  # Read replicas (see replicas.py), e.g. DATABASE_REPLICA_URLS=postgresql://fyyur@replica1/fyyur_db,postgresql://...:
+  # the read-only requests read from them round robin, skipping a replica while its health check fails;
+  # a client that just posted a form reads from the primary for REPLICA_STICKY_SECONDS
+  SQLALCHEMY_REPLICA_URIS = [database_url(url.strip()) for url in env('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+  REPLICA_HEALTH_CHECK_INTERVAL = env('REPLICA_HEALTH_CHECK_INTERVAL', 30, int)
+  REPLICA_STICKY_SECONDS = env('REPLICA_STICKY_SECONDS', 10, int)
+
+  # Background jobs (see jobs.py): 'thread' runs them in a pool of each web process, 'database' queues them in
+  # the Job table for `flask jobs worker`; a failed job is retried after JOBS_RETRY_DELAY * 2^(attempt - 1) seconds
+  JOBS_BACKEND = env('JOBS_BACKEND', 'thread')
+  JOBS_WORKERS = env('JOBS_WORKERS', 4, int)
+  JOBS_MAX_ATTEMPTS = 5
+  JOBS_RETRY_DELAY = 2
+  # a running job is handed to another worker when it isn't finished after this many seconds
+  JOBS_LEASE_SECONDS = 300
+
+  # Number of shows displayed per page on /shows
+  SHOWS_PER_PAGE = 30
+
+  # Default & maximum (?limit=) number of venues/artists displayed per page on /venues & /artists
+  LISTING_PAGE_SIZE = 50
+  LISTING_MAX_PAGE_SIZE = 200
+
+  # Batch scheduling (/shows/batch & POST /api/v1/shows): shows starting less than SHOW_SLOT_MINUTES apart
+  # at the same venue are double bookings; a batch has at most SHOW_BATCH_MAX_SIZE shows
+  SHOW_SLOT_MINUTES = 180
+  SHOW_BATCH_MAX_SIZE = 500
+
+  # Maximum number of results displayed by the venue & artist searches
+  SEARCH_RESULTS_LIMIT = 50
+  # seconds between two checks of the in-memory search index (databases other than PostgreSQL) against its table,
+  # which rebuild it after the changes made by the other processes
+  SEARCH_INDEX_CHECK_INTERVAL = 30
+  # Names returned by /api/v1/autocomplete/<venues|artists> (default & ?limit= maximum), seconds browsers may reuse them
+  AUTOCOMPLETE_LIMIT = 10
+  AUTOCOMPLETE_MAX_LIMIT = 25
+  AUTOCOMPLETE_MAX_AGE = 30
+
+  # Response cache of the read-heavy pages (see cache.py): 'lru', 'shared' or 'null'
+  CACHE_BACKEND = env('CACHE_BACKEND', 'lru')
+  CACHE_DEFAULT_TTL = 60
+  CACHE_MAX_ENTRIES = 1024
+  # client of the shared cache server used by the 'shared' backend, e.g. redis.Redis(host='localhost')
+  CACHE_SHARED_CLIENT = None
+  # {% cache %} fragments of the templates & cached values (listing counts): they are versioned, so with the 'shared'
+  # backend they live CACHE_FRAGMENT_TTL; the 'lru' versions don't see the writes of the other processes, so there
+  # they live CACHE_DEFAULT_TTL, in an LRU of their own
+  CACHE_FRAGMENT_TTL = 3600
+  CACHE_FRAGMENT_MAX_ENTRIES = 10000
+
+  # JSON API (/api/v1): default & maximum number of records per page, rows fetched per database round trip
+  API_PAGE_SIZE = 100
+  API_MAX_PAGE_SIZE = 1000
+  API_STREAM_BATCH_SIZE = 200
+
+  # Rows fetched per round trip from the server-side cursor of the bulk exports
+  EXPORT_BATCH_SIZE = 2000
+
+  # Dates displayed by the datetime filter: locales matched against Accept-Language,
+  # timezone used when the browser didn't send a 'timezone' cookie (None: as stored, the server's local time)
+  DEFAULT_LOCALE = 'en'
+  SUPPORTED_LOCALES = ('en',)
+  DEFAULT_TIMEZONE = None
+
+  # SQL instrumentation (see instrumentation.py): statements slower than this are logged with their EXPLAIN plan,
+  # views going over their @query_budget raise QueryBudgetExceeded instead of logging a warning when strict
+  SQL_SLOW_QUERY_MS = env('SQL_SLOW_QUERY_MS', 250, int)
+  SQL_EXPLAIN_SLOW_QUERIES = True
+  SQL_QUERY_BUDGET_STRICT = False
+
+  # Application logging outside of debug mode (see logs.py): JSON lines written by a background thread,
+  # rotated by size (LOG_MAX_BYTES) or, when LOG_ROTATE_WHEN is set (e.g. 'midnight'), by time;
+  # INFO records are kept for this fraction of the requests
+  LOG_FILE = env('LOG_FILE', 'error.log')
+  LOG_MAX_BYTES = 10 * 1024 * 1024
+  LOG_ROTATE_WHEN = env('LOG_ROTATE_WHEN')
+  LOG_BACKUP_COUNT = 5
+  LOG_QUEUE_SIZE = 10000
+  LOG_INFO_SAMPLE_RATE = env('LOG_INFO_SAMPLE_RATE', 1.0, float)
+
+
+class DevelopmentConfig(Config):
+  # Enable debug mode.
+  DEBUG = True
+  # stable across restarts so that the sessions survive the reloader
+  SECRET_KEY = env('SECRET_KEY', 'development-secret-key')
+
+
+class TestConfig(Config):
+  TESTING = True
+  SECRET_KEY = 'test-secret-key'
+  SQLALCHEMY_DATABASE_URI = database_url(env('TEST_DATABASE_URL', 'postgresql://localhost:5432/fyyur_test'))
+  WTF_CSRF_ENABLED = False
+  CACHE_BACKEND = 'null'
+  # the jobs are done when commit() returns
+  JOBS_BACKEND = 'sync'
+  # N+1 regressions fail the tests
+  SQL_QUERY_BUDGET_STRICT = True
+
+
+class ProductionConfig(Config):
+  DB_STATEMENT_TIMEOUT_MS = env('DB_STATEMENT_TIMEOUT_MS', 5000, int)
+  LOG_INFO_SAMPLE_RATE = env('LOG_INFO_SAMPLE_RATE', 0.1, float)
+
+  def __init__(self):
+    # a key generated at startup differs in every worker
+    if not self.SECRET_KEY:
+      raise RuntimeError('SECRET_KEY must be set in the environment in production')
+
+
+CONFIGS = {
+  'development': DevelopmentConfig,
+  'test': TestConfig,
+  'production': ProductionConfig,
+}
+
+
+def get_config(name=None):
+  name = name or env('FYYUR_CONFIG', 'development')
+  if name not in CONFIGS:
+    raise RuntimeError('FYYUR_CONFIG must be one of %s, not %r' % (', '.join(sorted(CONFIGS)), name))
+  return CONFIGS[name]()
@@ -0,0 +1,90 @@
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+# Streams a whole table (or the rows added/changed since the last export) as
+# CSV or JSONL, optionally gzip compressed, in constant memory: rows come from
+# a server-side cursor in batches and are encoded & compressed chunk by chunk.
+# Used by `flask export` and /api/v1/export/<table>.
+
+import csv
+import io
+import json
+import zlib
+
+from jsonapi import json_default
+
+FORMATS = ('csv', 'jsonl')
+# rows encoded into one output chunk
+CHUNK_ROWS = 500
+
+
+def export_query(db, model, since_id=None, since=None, batch_size=1000):
+  # SQL query:
+  # SELECT * FROM <model> WHERE id > since_id ORDER BY id
+  # SELECT * FROM <model> WHERE updated_at >= since ORDER BY updated_at, id
+  # SELECT * FROM <model> WHERE updated_at > since OR (updated_at = since AND id > since_id) ORDER BY updated_at, id
+  # updated_at has a resolution (a second on SQLite): a row committed after an export can have the updated_at of its
+  # last row, so since alone is inclusive & with since_id the (updated_at, id) of the last exported row is the resume
+  # point of the next export
+  query = db.session.query(*model.__table__.columns)
+  if since is None:
+    if since_id is not None:
+      query = query.filter(model.id > since_id)
+    order = (model.id,)
+  else:
+    if since_id is None:
+      query = query.filter(model.updated_at >= since)
+    else:
+      query = query.filter(db.or_(model.updated_at > since, db.and_(model.updated_at == since, model.id > since_id)))
+    order = (model.updated_at, model.id)
+  # stream_results asks the driver for a server-side cursor, yield_per fetches it batch by batch
+  return query.order_by(*order).execution_options(stream_results=True).yield_per(batch_size)
+
+
+def csv_value(value):
+  if isinstance(value, list):
+    # same separator as the importer accepts for genres
+    return ';'.join(value)
+  if value is None:
+    return ''
+  return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def encode_csv(rows, columns):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(columns)
+  for position, row in enumerate(rows, 1):
+    writer.writerow([csv_value(value) for value in row])
+    if position % CHUNK_ROWS == 0:
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate()
+  yield buffer.getvalue()
+
+
+def encode_jsonl(rows, columns):
+  lines = []
+  for row in rows:
+    lines.append(json.dumps(dict(zip(columns, row)), default=json_default, separators=(',', ':')))
+    if len(lines) == CHUNK_ROWS:
+      yield '\n'.join(lines) + '\n'
+      lines = []
+  if lines:
+    yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+  # wbits=31 writes a gzip header & trailer, the output can be read with gunzip
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+  for chunk in chunks:
+    data = compressor.compress(chunk.encode('utf-8'))
+    if data:
+      yield data
+  yield compressor.flush()
+
+
+def export_chunks(rows, columns, file_format, compress=False):
+  encode = encode_csv if file_format == 'csv' else encode_jsonl
+  chunks = encode(rows, columns)
+  return gzip_chunks(chunks) if compress else (chunk.encode('utf-8') for chunk in chunks)
@@ -0,0 +1,30 @@
+#----------------------------------------------------------------------------#
+# Extensions.
+#----------------------------------------------------------------------------#
+# Created unbound so that the models & blueprints can import them; create_app()
+# (app.py) binds them to the application with init_app.
+
+from flask_moment import Moment
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from cache import ResponseCache
+from formatting import request_locale, request_timezone
+from instrumentation import SQLInstrumentation
+from metrics import Metrics, pool_metrics, cache_metrics
+from replicas import ReplicaRouter, RoutingSession, replica_metrics
+from jobs import JobQueue
+
+moment = Moment()
+# reads of the read-only requests go to the replicas, see replicas.py
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
+cache = ResponseCache()
+replicas = ReplicaRouter()
+jobs = JobQueue(db)
+sql_instrumentation = SQLInstrumentation()
+metrics = Metrics()
+metrics.add_collector(lambda: pool_metrics(db.engine))
+metrics.add_collector(lambda: cache_metrics(cache.stats()))
+metrics.add_collector(lambda: replica_metrics(replicas))
+# pages displaying dates differ per locale & timezone
+cache.vary_on(lambda: (request_locale(), request_timezone()))
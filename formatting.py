@@ -0,0 +1,95 @@
+#----------------------------------------------------------------------------#
+# Date & time formatting.
+#----------------------------------------------------------------------------#
+# The `datetime` Jinja filter. Values coming out of SQLAlchemy are already
+# datetime objects and are formatted as is (only strings are parsed), the
+# Babel pattern & locale of every (format, locale) pair are compiled once, and
+# the rendered strings are memoized in a bounded LRU since the same show times
+# are displayed over & over.
+#
+# The locale is the best match of the Accept-Language header among
+# SUPPORTED_LOCALES (or g.locale when a view sets it). Naive values are the
+# server's local time, as the app stores & compares them (datetime.now()); they
+# are displayed as is, or converted to the timezone of the 'timezone' cookie
+# (or g.timezone, DEFAULT_TIMEZONE) when there is one. The cookie must name a
+# known IANA timezone, any other value falls back to DEFAULT_TIMEZONE: it is
+# part of the render memo & of the response cache keys.
+
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app, g, has_request_context, request
+
+NAMED_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+  # babel is only imported once the first date is displayed
+  from babel.core import Locale
+  from babel.dates import parse_pattern
+  return parse_pattern(NAMED_FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=64)
+def lookup_timezone(name):
+  from babel.dates import get_timezone
+  try:
+    return get_timezone(name)
+  except LookupError:
+    return None
+
+
+@lru_cache(maxsize=1)
+def known_timezones():
+  import zoneinfo
+  return frozenset(zoneinfo.available_timezones())
+
+
+@lru_cache(maxsize=4096)
+def render_datetime(value, format, locale, timezone):
+  pattern, locale = compiled_pattern(format, locale)
+  if timezone:
+    tzinfo = lookup_timezone(timezone)
+    if tzinfo is not None:
+      # astimezone() takes a naive value for the local time
+      value = value.astimezone(tzinfo)
+  return pattern.apply(value, locale)
+
+
+def request_locale():
+  if not has_request_context():
+    return current_app.config.get('DEFAULT_LOCALE', 'en')
+  locale = g.get('locale')
+  if locale is None:
+    # matched once per request, every date of the page uses it
+    config = current_app.config
+    default = config.get('DEFAULT_LOCALE', 'en')
+    locale = g.locale = request.accept_languages.best_match(config.get('SUPPORTED_LOCALES', (default,)), default=default)
+  return locale
+
+
+def request_timezone():
+  if not has_request_context():
+    return current_app.config.get('DEFAULT_TIMEZONE')
+  if 'timezone' not in g:
+    timezone = request.cookies.get('timezone')
+    g.timezone = timezone if timezone in known_timezones() else current_app.config.get('DEFAULT_TIMEZONE')
+  return g.timezone
+
+
+@lru_cache(maxsize=1024)
+def parse_datetime(value):
+  import dateutil.parser
+  return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format='medium'):
+  if value is None or value == '':
+    return ''
+  if not isinstance(value, datetime):
+    value = parse_datetime(value)
+  return render_datetime(value, format, request_locale(), request_timezone())
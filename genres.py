@@ -0,0 +1,81 @@
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+# The music genres a venue or an artist can be tagged with, and the column
+# type storing them: a native genre[] (ARRAY of the 'genre' ENUM, GIN indexed)
+# on PostgreSQL, a JSON encoded list on any other database (SQLite in tests).
+
+import csv
+import json
+
+from sqlalchemy import cast, Text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+GENRES = (
+  'Alternative',
+  'Blues',
+  'Classical',
+  'Country',
+  'Electronic',
+  'Folk',
+  'Funk',
+  'Hip-Hop',
+  'Heavy Metal',
+  'Instrumental',
+  'Jazz',
+  'Musical Theatre',
+  'Pop',
+  'Punk',
+  'R&B',
+  'Reggae',
+  'Rock n Roll',
+  'Soul',
+  'Other',
+)
+
+genre_enum = postgresql.ENUM(*GENRES, name='genre', create_type=False)
+
+
+def parse_genre_array(value):
+  # '{Jazz,"Rock n Roll"}' (PostgreSQL array literal) -> ['Jazz', 'Rock n Roll']
+  value = value.strip()[1:-1]
+  if not value:
+    return []
+  return next(csv.reader([value], quotechar='"', escapechar='\\', skipinitialspace=True))
+
+
+class GenreList(TypeDecorator):
+  impl = Text
+  cache_ok = True
+
+  def load_dialect_impl(self, dialect):
+    if dialect.name == 'postgresql':
+      return dialect.type_descriptor(postgresql.ARRAY(genre_enum))
+    return dialect.type_descriptor(Text())
+
+  def process_bind_param(self, value, dialect):
+    if value is None:
+      return None
+    value = [genre for genre in value if genre]
+    unknown = set(value) - set(GENRES)
+    if unknown:
+      raise ValueError('Unknown genres: %s' % ', '.join(sorted(unknown)))
+    if dialect.name == 'postgresql':
+      return value
+    return json.dumps(value)
+
+  def process_result_value(self, value, dialect):
+    if value is None:
+      return []
+    if dialect.name == 'postgresql':
+      # older drivers return arrays of an unregistered enum type as the raw literal
+      return parse_genre_array(value) if isinstance(value, str) else list(value)
+    return json.loads(value)
+
+
+def has_genre(column, genre, dialect_name):
+  # genres @> ARRAY['Jazz']::genre[] is answered by the GIN index on PostgreSQL
+  if dialect_name == 'postgresql':
+    return column.op('@>')(cast(postgresql.array([genre]), postgresql.ARRAY(genre_enum)))
+  return cast(column, Text).like('%' + json.dumps(genre) + '%')
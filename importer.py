@@ -0,0 +1,196 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+# Streams venues, artists or shows from a CSV or JSONL file into the database
+# (`flask import --help`). Every row is validated with the same form the web
+# pages use, valid rows are inserted in batches with a single executemany
+# INSERT (or COPY ... FROM STDIN on PostgreSQL) and one commit per batch.
+#
+# After each committed batch the number of rows consumed is written to the
+# checkpoint file, so an interrupted import started again with the same
+# checkpoint resumes right after the last committed batch.
+
+import csv
+import io
+import json
+import os
+import time
+
+from werkzeug.datastructures import MultiDict
+
+# columns imported for every table, in the order of the COPY statements
+TABLE_COLUMNS = {
+  'venues': ('name', 'genres', 'city', 'state', 'address', 'phone', 'website', 'image_link', 'facebook_link'),
+  'artists': ('name', 'genres', 'city', 'state', 'phone', 'website', 'image_link', 'facebook_link'),
+  'shows': ('venue_id', 'artist_id', 'start_time'),
+}
+
+
+def detect_format(path):
+  extension = os.path.splitext(path[:-3] if path.endswith('.gz') else path)[1].lower()
+  return 'jsonl' if extension in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def open_text(path):
+  if path.endswith('.gz'):
+    import gzip
+    return gzip.open(path, 'rt', encoding='utf-8', newline='')
+  return io.open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_records(path, file_format):
+  # yields one dict per data row without ever holding the whole file
+  with open_text(path) as source:
+    if file_format == 'csv':
+      for record in csv.DictReader(source):
+        yield record
+    else:
+      for line in source:
+        line = line.strip()
+        if line:
+          yield json.loads(line)
+
+
+def to_formdata(record):
+  # lists (genres) become repeated keys like a multiple select; in CSV genres are separated by ';' or ','
+  formdata = MultiDict()
+  for key, value in record.items():
+    if value is None:
+      continue
+    if key == 'genres' and not isinstance(value, list):
+      value = [genre.strip() for genre in value.replace(';', ',').split(',') if genre.strip()]
+    if isinstance(value, list):
+      for item in value:
+        formdata.add(key, item)
+    else:
+      formdata.add(key, str(value))
+  return formdata
+
+
+def pg_array(values):
+  # ['Jazz', 'Rock n Roll'] -> {"Jazz","Rock n Roll"}
+  return '{%s}' % ','.join('"%s"' % value.replace('\\', '\\\\').replace('"', '\\"') for value in values)
+
+
+class Importer(object):
+
+  def __init__(self, db, model, form_class, table, batch_size=1000, use_copy=True, echo=print,
+               rejects=None, exists=None):
+    self.db = db
+    self.model = model
+    self.form_class = form_class
+    self.columns = TABLE_COLUMNS[table]
+    self.batch_size = batch_size
+    self.use_copy = use_copy
+    self.echo = echo
+    self.rejects = rejects
+    # exists(rows) -> predicate telling whether the references of a row exist, checked with one query per batch
+    self.exists = exists
+    self.imported = 0
+    self.rejected = 0
+
+  def validate(self, row_number, record):
+    form = self.form_class(formdata=to_formdata(record), meta={'csrf': False})
+    if not form.validate():
+      self.reject(row_number, record, form.errors)
+      return None
+    row = dict((column, form[column].data) for column in self.columns)
+    for column in self.columns:
+      if column.endswith('_id'):
+        try:
+          row[column] = int(row[column])
+        except (TypeError, ValueError):
+          self.reject(row_number, record, {column: ['Not a valid id.']})
+          return None
+    return row
+
+  def reject(self, row_number, record, errors):
+    self.rejected += 1
+    if self.rejects is not None:
+      self.rejects.write(json.dumps({'row': row_number, 'record': record, 'errors': errors}, default=str) + '\n')
+
+  def run(self, records, checkpoint=None):
+    consumed = 0
+    if checkpoint and os.path.exists(checkpoint):
+      with open(checkpoint) as checkpoint_file:
+        consumed = json.load(checkpoint_file).get('consumed', 0)
+      self.echo('resuming after %d rows' % consumed)
+
+    started = time.time()
+    batch = []
+    batch_number = 0
+    pending = 0
+    for row_number, record in enumerate(records, 1):
+      if row_number <= consumed:
+        continue
+      row = self.validate(row_number, record)
+      if row is not None:
+        batch.append((row_number, row))
+      pending += 1
+      if pending == self.batch_size:
+        batch_number += 1
+        self.flush(batch_number, batch)
+        consumed = row_number
+        self.save_checkpoint(checkpoint, consumed)
+        batch = []
+        pending = 0
+    if pending:
+      batch_number += 1
+      self.flush(batch_number, batch)
+    self.save_checkpoint(checkpoint, None)
+
+    elapsed = time.time() - started
+    self.echo('imported %d rows, rejected %d in %.1fs (%.0f rows/s)' % (
+      self.imported, self.rejected, elapsed, self.imported / elapsed if elapsed else 0))
+    return self.imported
+
+  def flush(self, batch_number, batch):
+    started = time.time()
+    rows = [row for _, row in batch]
+    if rows and self.exists is not None:
+      valid = self.exists(rows)
+      for row_number, row in batch:
+        if not valid(row):
+          self.reject(row_number, row, {'references': ['Unknown venue or artist.']})
+      rows = [row for row in rows if valid(row)]
+    if rows:
+      connection = self.db.session.connection()
+      if self.use_copy and connection.dialect.name == 'postgresql':
+        self.copy(connection, rows)
+      else:
+        connection.execute(self.model.__table__.insert(), rows)
+      self.db.session.commit()
+    self.imported += len(rows)
+
+    elapsed = time.time() - started
+    self.echo('batch %d: %d rows inserted in %.3fs (%.0f rows/s), %d imported, %d rejected so far' % (
+      batch_number, len(rows), elapsed, len(rows) / elapsed if elapsed else 0, self.imported, self.rejected))
+
+  def copy(self, connection, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+      writer.writerow([
+        pg_array(row[column]) if isinstance(row[column], list) else ('' if row[column] is None else row[column])
+        for column in self.columns
+      ])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+      cursor.copy_expert('COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (
+        self.model.__tablename__, ', '.join(self.columns)), buffer)
+    finally:
+      cursor.close()
+
+  def save_checkpoint(self, checkpoint, consumed):
+    if not checkpoint:
+      return
+    if consumed is None:
+      # the whole file went through: the next import of the same file starts over
+      if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+      return
+    temporary = checkpoint + '.tmp'
+    with open(temporary, 'w') as checkpoint_file:
+      json.dump({'consumed': consumed}, checkpoint_file)
+    os.replace(temporary, checkpoint)
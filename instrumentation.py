@@ -0,0 +1,128 @@
+#----------------------------------------------------------------------------#
+# SQL instrumentation.
+#----------------------------------------------------------------------------#
+# Counts & times the SQL statements of every request through the SQLAlchemy
+# engine events, adds a Server-Timing header (db time & query count, template
+# render time, total time), logs the statements slower than
+# SQL_SLOW_QUERY_MS with their parameters & EXPLAIN plan, and checks the
+# query budget the views declare with @query_budget(n): going over it is
+# logged, and raises QueryBudgetExceeded when SQL_QUERY_BUDGET_STRICT is set
+# (so the test suite fails on an N+1 regression).
+
+import time
+
+from flask import current_app, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+  pass
+
+
+def query_budget(max_queries):
+  # @query_budget(1) under the route decorator(s) of a view
+  def decorator(view):
+    view.query_budget = max_queries
+    return view
+  return decorator
+
+
+def request_stats():
+  if not has_request_context():
+    return None
+  stats = g.get('sql_stats')
+  if stats is None:
+    stats = g.sql_stats = {'queries': 0, 'db_time': 0.0, 'render_time': 0.0, 'started': time.time()}
+  return stats
+
+
+class SQLInstrumentation(object):
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    # on the Engine class: every engine (primary & replicas) is instrumented, once for all the apps
+    if not event.contains(Engine, 'before_cursor_execute', self.before_cursor_execute):
+      event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+      event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+    before_render_template.connect(self.before_render, app)
+    template_rendered.connect(self.after_render, app)
+    app.before_request(self.before_request)
+    app.after_request(self.after_request)
+    app.extensions['sql_instrumentation'] = self
+
+  def before_request(self):
+    # starts the request clock (must not return anything, it would become the response)
+    request_stats()
+
+  def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.time())
+
+  def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.time() - conn.info['query_started'].pop()
+    if conn.info.get('explaining') or conn.get_execution_options().get('uninstrumented'):
+      return
+    stats = request_stats()
+    if stats is not None:
+      stats['queries'] += 1
+      stats['db_time'] += elapsed
+    try:
+      threshold = current_app.config.get('SQL_SLOW_QUERY_MS')
+    except RuntimeError:
+      # outside of an application context
+      return
+    if threshold is not None and elapsed * 1000 >= threshold:
+      self.log_slow_query(conn, statement, parameters, elapsed, executemany)
+
+  def log_slow_query(self, conn, statement, parameters, elapsed, executemany):
+    plan = None
+    if not executemany and statement.lstrip().upper().startswith('SELECT') and current_app.config.get('SQL_EXPLAIN_SLOW_QUERIES'):
+      conn.info['explaining'] = True
+      try:
+        prefix = 'EXPLAIN ' if conn.dialect.name == 'postgresql' else 'EXPLAIN QUERY PLAN '
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+        plan = '\n'.join(' '.join(str(column) for column in row) for row in rows)
+      except Exception as error:
+        plan = 'EXPLAIN failed: %s' % error
+      finally:
+        conn.info['explaining'] = False
+    current_app.logger.warning(
+      'slow query (%.1fms) on %s: %s\nparameters: %r%s',
+      elapsed * 1000,
+      request.path if has_request_context() else '-',
+      statement,
+      parameters,
+      '\nplan:\n' + plan if plan else ''
+    )
+
+  def before_render(self, sender, template, context, **extra):
+    stats = request_stats()
+    if stats is not None:
+      stats.setdefault('render_started', []).append(time.time())
+
+  def after_render(self, sender, template, context, **extra):
+    stats = request_stats()
+    if stats is not None and stats.get('render_started'):
+      stats['render_time'] += time.time() - stats['render_started'].pop()
+
+  def after_request(self, response):
+    stats = request_stats()
+    # queries issued while rendering (e.g. lazy loads from a template) count in both db & render
+    response.headers['Server-Timing'] = 'db;dur=%.2f;desc="%d queries", render;dur=%.2f, total;dur=%.2f' % (
+      stats['db_time'] * 1000,
+      stats['queries'],
+      stats['render_time'] * 1000,
+      (time.time() - stats['started']) * 1000
+    )
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and stats['queries'] > budget:
+      message = '%s issued %d queries, over its budget of %d' % (request.endpoint, stats['queries'], budget)
+      if current_app.config.get('SQL_QUERY_BUDGET_STRICT'):
+        raise QueryBudgetExceeded(message)
+      current_app.logger.warning(message)
+    return response
@@ -0,0 +1,203 @@
+#----------------------------------------------------------------------------#
+# Background jobs.
+#----------------------------------------------------------------------------#
+# Runs the side effects of a write (e.g. the show counters) off the request
+# path. A view queues a job inside the transaction of the write:
+#
+#   jobs.enqueue('counters.recount', venue_id, artist_id, key='recount:show:%d' % show.id)
+#   db.session.commit()
+#
+# and the job runs once that transaction commits (a rolled back transaction
+# drops its jobs). Backends (JOBS_BACKEND):
+#   'thread'   - a thread pool of the web process (default)
+#   'database' - a row of the Job table, committed with the write itself, run
+#                by `flask jobs worker` in another process
+#   'sync'     - run before commit() returns, for the tests
+#
+# A failing job is retried JOBS_MAX_ATTEMPTS times with an exponential delay.
+# A job queued again with the key of an earlier, committed one (or of one of
+# the same transaction) is ignored; since a job
+# can still run twice (a worker dying between the job & its bookkeeping),
+# jobs must be idempotent, e.g. recount rather than increment.
+
+import json
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+BACKENDS = ('thread', 'database', 'sync')
+# keys of the jobs already committed by this process, for the thread & sync backends
+SEEN_KEYS = 10000
+
+
+class JobQueue(object):
+
+  def __init__(self, db, app=None):
+    self.db = db
+    self.model = None
+    self.tasks = {}
+    self.executor = None
+    self.seen_keys = OrderedDict()
+    self.lock = threading.Lock()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.backend = app.config.get('JOBS_BACKEND', 'thread')
+    if self.backend not in BACKENDS:
+      raise ValueError('Unknown JOBS_BACKEND %r' % self.backend)
+    self.max_attempts = app.config.get('JOBS_MAX_ATTEMPTS', 5)
+    self.retry_delay = app.config.get('JOBS_RETRY_DELAY', 2)
+    self.lease = app.config.get('JOBS_LEASE_SECONDS', 300)
+    if self.executor is None:
+      self.executor = ThreadPoolExecutor(max_workers=app.config.get('JOBS_WORKERS', 4), thread_name_prefix='jobs')
+    session_class = self.db.session.session_factory.class_
+    if not event.contains(session_class, 'after_commit', self.after_commit):
+      event.listen(session_class, 'after_commit', self.after_commit)
+      event.listen(session_class, 'after_soft_rollback', self.after_rollback)
+    app.extensions['jobs'] = self
+
+  def use_table(self, model):
+    # the Job model (models.py) of the 'database' backend
+    self.model = model
+
+  def register(self, name, function):
+    self.tasks[name] = function
+    return function
+
+  #  Queueing
+  #  ----------------------------------------------------------------
+
+  def enqueue(self, name, *args, **options):
+    # args must be JSON serializable; returns False when a job with the same key was already queued
+    if name not in self.tasks:
+      raise KeyError('Unknown job %r' % name)
+    key = options.get('key')
+    if self.backend == 'database':
+      return self.store(name, args, key)
+    session = self.db.session()
+    if not session.in_transaction():
+      # so that a rollback() before the next commit() drops the job
+      session.begin()
+    pending = session.info.setdefault('pending_jobs', [])
+    if key is not None:
+      # the key is only taken once the transaction commits: a rolled back job can be queued again
+      with self.lock:
+        if key in self.seen_keys:
+          return False
+      if any(job[3] == key for job in pending):
+        return False
+    pending.append((current_app._get_current_object(), name, list(args), key))
+    return True
+
+  def store(self, name, args, key):
+    # the row is part of the current transaction (outbox): committed with the write, rolled back with it;
+    # INSERT ... ON CONFLICT (key) DO NOTHING skips a key queued before, even by a concurrent request
+    session = self.db.session
+    dialect = session.get_bind(self.model).dialect.name
+    insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(dialect, self.db.insert)
+    statement = insert(self.model).values(name=name, args=json.dumps(args), key=key, run_at=datetime.now())
+    if key is not None and dialect in ('postgresql', 'sqlite'):
+      statement = statement.on_conflict_do_nothing(index_elements=['key'])
+    return session.execute(statement).rowcount == 1
+
+  def after_commit(self, session):
+    pending = session.info.pop('pending_jobs', None)
+    if not pending:
+      return
+    with self.lock:
+      for job in pending:
+        if job[3] is not None:
+          self.seen_keys[job[3]] = True
+      while len(self.seen_keys) > SEEN_KEYS:
+        self.seen_keys.popitem(last=False)
+    futures = [self.executor.submit(self.run, app, name, args, 1) for app, name, args, _ in pending]
+    if self.backend == 'sync':
+      # the jobs use their own session (another thread): this one can't run SQL in after_commit
+      for future in futures:
+        future.result()
+
+  def after_rollback(self, session, previous_transaction):
+    if previous_transaction.parent is None:
+      session.info.pop('pending_jobs', None)
+
+  #  Running
+  #  ----------------------------------------------------------------
+
+  def run(self, app, name, args, attempt):
+    with app.app_context():
+      try:
+        self.tasks[name](*args)
+      except Exception:
+        self.db.session.rollback()
+        if attempt >= self.max_attempts or self.backend == 'sync':
+          app.logger.error('job %s%r failed after %d attempts\n%s', name, tuple(args), attempt, traceback.format_exc())
+          return
+        delay = self.retry_delay * 2 ** (attempt - 1)
+        app.logger.warning('job %s%r failed (attempt %d), retrying in %ss', name, tuple(args), attempt, delay)
+        timer = threading.Timer(delay, lambda: self.executor.submit(self.run, app, name, args, attempt + 1))
+        timer.daemon = True
+        timer.start()
+
+  def claim(self):
+    # a pending job that is due, or a running one whose worker hasn't finished it within the lease (it died);
+    # the conditional UPDATE makes sure that a single worker gets it
+    Job = self.model
+    now = datetime.now()
+    claimable = self.db.or_(
+      self.db.and_(Job.status == 'pending', Job.run_at <= now),
+      self.db.and_(Job.status == 'running', Job.claimed_at < now - timedelta(seconds=self.lease))
+    )
+    for job_id, in self.db.session.query(Job.id).filter(claimable).order_by(Job.run_at, Job.id).limit(10).all():
+      claimed = self.db.session.execute(self.db.update(Job)
+        .where(Job.id == job_id, claimable)
+        .values(status='running', claimed_at=now, attempts=Job.attempts + 1))
+      self.db.session.commit()
+      if claimed.rowcount == 1:
+        return self.db.session.get(Job, job_id)
+    return None
+
+  def execute(self, job):
+    Job = self.model
+    try:
+      self.tasks[job.name](*json.loads(job.args))
+      values = {'status': 'done', 'last_error': None}
+    except Exception:
+      self.db.session.rollback()
+      error = traceback.format_exc()
+      if job.attempts >= self.max_attempts:
+        current_app.logger.error('job %s %d failed after %d attempts\n%s', job.name, job.id, job.attempts, error)
+        values = {'status': 'failed', 'last_error': error}
+      else:
+        delay = self.retry_delay * 2 ** (job.attempts - 1)
+        values = {'status': 'pending', 'last_error': error, 'run_at': datetime.now() + timedelta(seconds=delay)}
+    self.db.session.execute(self.db.update(Job).where(Job.id == job.id).values(**values))
+    self.db.session.commit()
+    return values['status']
+
+  def work(self, poll_interval=1.0, once=False, echo=print):
+    # the loop of `flask jobs worker`; with once, stops when no job is due
+    while True:
+      job = self.claim()
+      if job is None:
+        if once:
+          return
+        time.sleep(poll_interval)
+        continue
+      started = time.time()
+      status = self.execute(job)
+      echo('job %d %s%s: %s in %.3fs' % (job.id, job.name, tuple(json.loads(job.args)), status, time.time() - started))
+
+  def purge(self, older_than):
+    # the done jobs are kept as the record of their idempotency keys until purged
+    Job = self.model
+    result = self.db.session.execute(self.db.delete(Job).where(Job.status == 'done', Job.updated_at < older_than))
+    self.db.session.commit()
+    return result.rowcount
@@ -0,0 +1,113 @@
+#----------------------------------------------------------------------------#
+# JSON API helpers.
+#----------------------------------------------------------------------------#
+# Sparse fieldsets (?fields=), keyset cursors, ETags and streamed list bodies
+# shared by the /api/v1 routes.
+
+import hashlib
+import json
+from datetime import date, datetime
+
+from flask import abort, request, stream_with_context, Response
+
+
+def to_json(value):
+  # compact separators: these documents are generated for machines
+  return json.dumps(value, default=json_default, separators=(',', ':'))
+
+
+def json_default(value):
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def parse_fields(allowed, default):
+  # ?fields=id,name -> ['id', 'name']; unknown fields are a client error
+  fields = request.args.get('fields')
+  if not fields:
+    return list(default)
+  fields = [field.strip() for field in fields.split(',') if field.strip()]
+  unknown = [field for field in fields if field not in allowed]
+  if unknown or not fields:
+    abort(400)
+  return fields
+
+
+def select_fields(record, fields):
+  return dict((field, record[field]) for field in fields if field in record)
+
+
+def parse_limit(default, maximum):
+  try:
+    limit = int(request.args.get('limit', default))
+  except ValueError:
+    abort(400)
+  if limit < 1:
+    abort(400)
+  return min(limit, maximum)
+
+
+def list_etag(session, page):
+  # a weak ETag from the rows of a list page & the full query. page selects the columns telling the rows apart &
+  # changing with them (the ids, updated_at, the counters, ...) with the filters & the LIMIT of the list: every value
+  # of every row is hashed, so any change of one of them changes the ETag (aggregates would not see two changes
+  # cancelling out, nor a second write within the resolution of updated_at). It comes from the data, so the writes
+  # of every process (other workers, `flask import`, the jobs) change it, whatever the cache backend.
+  # SQL query:
+  # SELECT id, updated_at, ... FROM <list> WHERE <filters> ORDER BY ... LIMIT limit + 1
+  fingerprint = hashlib.sha1()
+  for row in session.execute(page.statement):
+    fingerprint.update(to_json(list(row)).encode('utf-8'))
+    fingerprint.update(b'\n')
+  fingerprint.update(request.full_path.encode('utf-8'))
+  return fingerprint.hexdigest()
+
+
+def not_modified(etag):
+  if request.if_none_match.contains_weak(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+  return None
+
+
+def json_response(document):
+  # small documents (detail routes) are built in full, hashed into a strong ETag & answered with 304 when unchanged
+  response = Response(to_json(document), mimetype='application/json')
+  response.add_etag()
+  return response.make_conditional(request)
+
+
+def closing_session(query, chunks):
+  # the query of a streamed body is built in the view, with the session that is removed when the view returns:
+  # iterating it afterwards reopens that session, closed here once the body is written (otherwise it holds its
+  # connection until it is garbage collected)
+  try:
+    for chunk in chunks:
+      yield chunk
+  finally:
+    query.session.close()
+
+
+def stream_list(rows, limit, serialize, cursor, etag=None):
+  # writes {"data": [...], "next": cursor} one row at a time as the rows come out of the database;
+  # rows holds up to limit + 1 rows, the extra one only tells that there is a next page
+  def generate():
+    yield '{"data":['
+    last_row = None
+    next_cursor = None
+    for position, row in enumerate(rows):
+      if position == limit:
+        next_cursor = cursor(last_row)
+        break
+      if position:
+        yield ','
+      yield to_json(serialize(row))
+      last_row = row
+    yield '],"next":%s}' % to_json(next_cursor)
+
+  response = Response(stream_with_context(closing_session(rows, generate())), mimetype='application/json')
+  if etag:
+    response.set_etag(etag, weak=True)
+  return response
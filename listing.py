@@ -0,0 +1,133 @@
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+# Keyset pagination, sorting & letter jumps of the /venues & /artists pages.
+#
+# A page is the rows following the last row of the previous page in the sort
+# order (the cursor holds that row's sort values), so the database walks an
+# index from the cursor instead of skipping OFFSET rows; the id ends every sort
+# so that the order is total. ?letter=M starts the listing at the first row
+# whose sort column (name or city), lowercased, is >= 'm'.
+#
+# name, city & state may be NULL: those rows sort after all the others (NULLS
+# LAST, the order of the PostgreSQL indexes), the cursor of a page ending on
+# one holds a null & the keyset predicate has IS NULL branches for them.
+#
+# The total shown by the pager is counted once per version of the listing's
+# cache namespace (bumped by every write) rather than on every request, & kept
+# no longer than the cached pages unless the cache backend is shared (see
+# ResponseCache.value); on PostgreSQL, an unfiltered table above ESTIMATE_ROWS
+# is counted from the planner statistics (pg_class.reltuples) and displayed as
+# an estimate.
+
+import base64
+import binascii
+import json
+import string
+
+from flask import abort, request
+from sqlalchemy.sql import text
+from genres import has_genre
+
+SORTS = ('name', 'city', 'upcoming')
+LETTERS = tuple(string.ascii_uppercase)
+ESTIMATE_ROWS = 100000
+
+
+def sort_columns(model, sort):
+  # (column, descending) pairs of the ORDER BY; the descending columns (the counters) are never NULL
+  if sort == 'name':
+    return [(model.name, False), (model.id, False)]
+  if sort == 'city':
+    return [(model.city, False), (model.state, False), (model.name, False), (model.id, False)]
+  return [(model.upcoming_shows_count, True), (model.name, False), (model.id, False)]
+
+
+def parse_listing(default_sort, default_limit, max_limit):
+  # ?sort=, ?limit=, ?after=<cursor> & ?letter= of the request; 400 when malformed
+  sort = request.args.get('sort', default_sort)
+  letter = request.args.get('letter')
+  if sort not in SORTS or (letter and (letter not in LETTERS or sort == 'upcoming')):
+    abort(400)
+  try:
+    limit = min(int(request.args.get('limit', default_limit)), max_limit)
+    after = decode_cursor(request.args['after']) if request.args.get('after') else None
+  except ValueError:
+    abort(400)
+  if limit < 1:
+    abort(400)
+  return sort, limit, after, letter
+
+
+def encode_cursor(values):
+  return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value):
+  # raises ValueError on a malformed cursor
+  try:
+    values = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode('utf-8'))
+  except (TypeError, UnicodeDecodeError, binascii.Error):
+    raise ValueError('malformed cursor')
+  if not isinstance(values, list) or not all(item is None or isinstance(item, (str, int)) for item in values):
+    raise ValueError('malformed cursor')
+  return values
+
+
+def genre_filters(db, model, genre):
+  # WHERE genres @> ARRAY[genre]
+  if not genre:
+    return {}
+  return {'genre=' + genre: has_genre(model.genres, genre, db.engine.dialect.name)}
+
+
+def after_condition(db, columns, values):
+  # rows after the cursor: (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ..., '<' for the descending columns;
+  # the NULLs sort last: (c > v OR c IS NULL) after a value, only the other NULLs (c IS NULL) are level with a null
+  conditions = []
+  for position, (column, descending) in enumerate(columns):
+    value = values[position]
+    if value is None and not descending:
+      # nothing sorts after a null
+      continue
+    beyond = column < value if descending else db.or_(column > value, column.is_(None))
+    equal = [previous.is_(None) if previous_value is None else previous == previous_value
+      for (previous, _), previous_value in zip(columns[:position], values)]
+    conditions.append(db.and_(*(equal + [beyond])))
+  return db.or_(*conditions)
+
+
+def order_by(columns):
+  return [column.desc() if descending else column.asc().nulls_last() for column, descending in columns]
+
+
+def paginate(db, query, columns, limit, after=None, letter=None):
+  # returns the rows of the page & the cursor of the next one (None on the last page)
+  if after is not None:
+    if len(after) != len(columns):
+      abort(400)
+    query = query.filter(after_condition(db, columns, after))
+  elif letter:
+    query = query.filter(db.or_(db.func.lower(columns[0][0]) >= letter.lower(), columns[0][0].is_(None)))
+  query = query.order_by(*order_by(columns))
+  # one extra row tells whether there is a next page
+  rows = query.limit(limit + 1).all()
+  next_cursor = None
+  if len(rows) > limit:
+    last_row = rows[limit - 1]
+    next_cursor = encode_cursor([getattr(last_row, column.key) for column, _ in columns])
+  return rows[:limit], next_cursor
+
+
+def listing_count(db, cache, model, filters, namespace):
+  # filters maps a name (part of the cache key, e.g. 'genre=Jazz') to its condition; returns (count, estimated)
+  def count():
+    if not filters and db.engine.dialect.name == 'postgresql':
+      estimate = db.session.execute(text('SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)'),
+        {'table': '"%s"' % model.__tablename__}).scalar()
+      if estimate is not None and estimate > ESTIMATE_ROWS:
+        return estimate, True
+    return db.session.query(db.func.count(model.id)).filter(*filters.values()).scalar(), False
+
+  key = 'count:%s:%s' % (model.__tablename__, ','.join(sorted(filters)))
+  return cache.value(key, [namespace], count)
@@ -0,0 +1,142 @@
+#----------------------------------------------------------------------------#
+# Application logging.
+#----------------------------------------------------------------------------#
+# Request threads never write to the log file: the records go through a
+# QueueHandler into a bounded queue and a QueueListener thread formats them as
+# JSON lines & writes them to a rotating file (LOG_MAX_BYTES, or LOG_ROTATE_WHEN
+# for time based rotation). When the queue is full the record is dropped and
+# counted rather than blocking the request.
+#
+# Every record carries the id of the request it was logged from (the
+# X-Request-ID header, or a new one echoed in the response) and its route.
+# INFO & DEBUG records are sampled at LOG_INFO_SAMPLE_RATE per request: all
+# the records of a sampled request are kept, warnings & errors always are.
+
+import atexit
+import json
+import logging
+import queue
+import random
+import time
+import traceback
+import uuid
+import zlib
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+class JSONFormatter(logging.Formatter):
+
+  def format(self, record):
+    document = {
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + '.%03dZ' % record.msecs,
+      'level': record.levelname,
+      'logger': record.name,
+      'message': record.getMessage(),
+      'request_id': getattr(record, 'request_id', None),
+      'route': getattr(record, 'route', None),
+      'method': getattr(record, 'method', None),
+      'path': getattr(record, 'path', None),
+      'location': '%s:%d' % (record.pathname, record.lineno),
+    }
+    if getattr(record, 'sample_rate', 1.0) < 1.0:
+      document['sample_rate'] = record.sample_rate
+    if getattr(record, 'exception', None):
+      document['exception'] = record.exception
+    return json.dumps(document, default=str, separators=(',', ':'))
+
+
+class RequestQueueHandler(QueueHandler):
+  # runs on the request thread: only captures the request context & hands the record over
+
+  def __init__(self, log_queue, info_sample_rate=1.0):
+    QueueHandler.__init__(self, log_queue)
+    self.info_sample_rate = info_sample_rate
+    self.dropped = 0
+
+  def sampled(self, record):
+    if record.levelno >= logging.WARNING or self.info_sample_rate >= 1.0:
+      return True
+    if has_request_context():
+      # decided once per request so that a sampled request is logged in full
+      if 'log_sampled' not in g:
+        g.log_sampled = zlib.crc32(request_id().encode('utf-8')) % 10000 < self.info_sample_rate * 10000
+      return g.log_sampled
+    return random.random() < self.info_sample_rate
+
+  def emit(self, record):
+    if not self.sampled(record):
+      return
+    QueueHandler.emit(self, record)
+
+  def prepare(self, record):
+    # the message is merged & the traceback formatted here, the listener thread only serializes
+    record = logging.makeLogRecord(record.__dict__)
+    record.msg = record.getMessage()
+    record.args = None
+    if record.exc_info:
+      record.exception = ''.join(traceback.format_exception(*record.exc_info))
+    record.exc_info = None
+    record.exc_text = None
+    if record.levelno < logging.WARNING:
+      record.sample_rate = self.info_sample_rate
+    if has_request_context():
+      record.request_id = request_id()
+      record.route = request.endpoint
+      record.method = request.method
+      record.path = request.path
+    return record
+
+  def enqueue(self, record):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+
+
+def request_id():
+  if 'request_id' not in g:
+    g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+  return g.request_id
+
+
+def assign_request_id():
+  # before_request: must not return anything, it would become the response
+  request_id()
+
+
+def add_request_id(response):
+  if has_request_context() and 'request_id' in g:
+    response.headers.setdefault(REQUEST_ID_HEADER, g.request_id)
+  return response
+
+
+def file_handler(config):
+  filename = config.get('LOG_FILE', 'error.log')
+  if config.get('LOG_ROTATE_WHEN'):
+    handler = TimedRotatingFileHandler(filename, when=config['LOG_ROTATE_WHEN'], backupCount=config.get('LOG_BACKUP_COUNT', 5), encoding='utf-8')
+  else:
+    handler = RotatingFileHandler(filename, maxBytes=config.get('LOG_MAX_BYTES', 0), backupCount=config.get('LOG_BACKUP_COUNT', 5), encoding='utf-8')
+  handler.setFormatter(JSONFormatter())
+  return handler
+
+
+def configure_logging(app):
+  config = app.config
+  log_queue = queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000))
+  handler = RequestQueueHandler(log_queue, config.get('LOG_INFO_SAMPLE_RATE', 1.0))
+  handler.setLevel(logging.INFO)
+  listener = QueueListener(log_queue, file_handler(config), respect_handler_level=True)
+  listener.start()
+  # flushes what is still queued when the process exits
+  atexit.register(listener.stop)
+
+  app.logger.setLevel(logging.INFO)
+  app.logger.addHandler(handler)
+  app.before_request(assign_request_id)
+  app.after_request(add_request_id)
+  app.extensions['log_listener'] = listener
+  return handler
@@ -0,0 +1,240 @@
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+# Request rates, per-route latency histograms, error counts, template render
+# times, DB pool gauges & cache counters in the Prometheus text format, served
+# on /metrics.
+#
+# Every thread writes into its own shard (plain dicts found through a
+# threading.local), so recording a request takes no lock at all: the only lock
+# is taken when a thread records its first value and when /metrics merges the
+# shards. The shards of threads that are gone are folded into one retired
+# shard so that counters never go backwards and the list of shards stays as
+# long as the number of live threads.
+#
+# Rates are computed by Prometheus from the counters, e.g.
+#   rate(fyyur_http_requests_total[5m])
+
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import g, request, before_render_template, template_rendered, Response
+
+# seconds, upper bounds of the histogram buckets (+Inf is implied)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Shard(object):
+
+  def __init__(self, thread=None):
+    self.thread = weakref.ref(thread) if thread is not None else None
+    # (name, labels) -> value
+    self.counters = {}
+    # (name, labels) -> [count of bucket 0, ..., count of +Inf, sum]
+    self.histograms = {}
+    # templates being rendered by this thread, nested templates included
+    self.render_started = []
+
+  def alive(self):
+    return self.thread is None or self.thread() is not None
+
+  def merge(self, other):
+    for key, value in other.counters.copy().items():
+      self.counters[key] = self.counters.get(key, 0) + value
+    for key, values in other.histograms.copy().items():
+      mine = self.histograms.get(key)
+      if mine is None:
+        self.histograms[key] = list(values)
+      else:
+        for position, value in enumerate(list(values)):
+          mine[position] += value
+
+
+class Metrics(object):
+
+  def __init__(self, app=None, buckets=LATENCY_BUCKETS):
+    self.buckets = tuple(buckets)
+    self.local = threading.local()
+    self.lock = threading.Lock()
+    self.shards = []
+    self.retired = Shard()
+    self.collectors = []
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.before_request(self.before_request)
+    app.after_request(self.after_request)
+    before_render_template.connect(self.before_render, app)
+    template_rendered.connect(self.after_render, app)
+    app.add_url_rule('/metrics', 'metrics', self.view)
+    app.extensions['metrics'] = self
+
+  def add_collector(self, collect):
+    # collect() -> [(name, type, help, [(labels dict, value), ...]), ...], called on every scrape
+    self.collectors.append(collect)
+
+  #  Recording
+  #  ----------------------------------------------------------------
+
+  def shard(self):
+    shard = getattr(self.local, 'shard', None)
+    if shard is None:
+      shard = self.local.shard = Shard(threading.current_thread())
+      with self.lock:
+        self.shards.append(shard)
+    return shard
+
+  def inc(self, name, labels=(), amount=1):
+    # labels: tuple of (label, value) pairs
+    counters = self.shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + amount
+
+  def observe(self, name, labels, value):
+    histograms = self.shard().histograms
+    key = (name, labels)
+    values = histograms.get(key)
+    if values is None:
+      values = histograms[key] = [0] * (len(self.buckets) + 2)
+    values[bisect_left(self.buckets, value)] += 1
+    values[-1] += value
+
+  def count_error(self, code):
+    self.inc('fyyur_http_errors_total', (('code', str(code)),))
+
+  def before_request(self):
+    g.metrics_started = time.time()
+
+  def after_request(self, response):
+    started = g.get('metrics_started')
+    if started is not None:
+      # the endpoint, not the path, so that the number of series stays bounded
+      endpoint = request.endpoint or 'unmatched'
+      self.inc('fyyur_http_requests_total', (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))))
+      self.observe('fyyur_http_request_duration_seconds', (('endpoint', endpoint),), time.time() - started)
+    return response
+
+  def before_render(self, sender, template, context, **extra):
+    self.shard().render_started.append(time.time())
+
+  def after_render(self, sender, template, context, **extra):
+    render_started = self.shard().render_started
+    if render_started:
+      self.observe('fyyur_template_render_seconds', (('template', template.name or 'string'),), time.time() - render_started.pop())
+
+  #  Exposition
+  #  ----------------------------------------------------------------
+
+  def snapshot(self):
+    # merges the shards into a new one; the dead threads' shards are moved into the retired shard
+    total = Shard()
+    with self.lock:
+      live = []
+      for shard in self.shards:
+        if shard.alive():
+          live.append(shard)
+        else:
+          self.retired.merge(shard)
+      self.shards = live
+      total.merge(self.retired)
+      for shard in live:
+        total.merge(shard)
+    return total
+
+  def render(self):
+    total = self.snapshot()
+    lines = []
+    families = {}
+    for (name, labels), value in total.counters.items():
+      families.setdefault(name, []).append((labels, value))
+    for name in sorted(families):
+      lines.extend(header(name, 'counter'))
+      for labels, value in sorted(families[name]):
+        lines.append('%s%s %s' % (name, format_labels(labels), format_value(value)))
+
+    families = {}
+    for (name, labels), values in total.histograms.items():
+      families.setdefault(name, []).append((labels, values))
+    for name in sorted(families):
+      lines.extend(header(name, 'histogram'))
+      for labels, values in sorted(families[name]):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), values):
+          cumulative += count
+          le = '+Inf' if bound == float('inf') else format_value(bound)
+          lines.append('%s_bucket%s %d' % (name, format_labels(labels + (('le', le),)), cumulative))
+        lines.append('%s_sum%s %s' % (name, format_labels(labels), format_value(values[-1])))
+        lines.append('%s_count%s %d' % (name, format_labels(labels), cumulative))
+
+    for collect in self.collectors:
+      for name, kind, help, samples in collect():
+        lines.append('# HELP %s %s' % (name, help))
+        lines.append('# TYPE %s %s' % (name, kind))
+        for labels, value in samples:
+          lines.append('%s%s %s' % (name, format_labels(tuple(sorted(labels.items()))), format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+  def view(self):
+    return Response(self.render(), content_type=CONTENT_TYPE)
+
+
+HELP = {
+  'fyyur_http_requests_total': 'Requests handled, by endpoint, method & status.',
+  'fyyur_http_request_duration_seconds': 'Time spent handling a request, by endpoint.',
+  'fyyur_http_errors_total': 'Responses of the 404 & 500 error handlers.',
+  'fyyur_template_render_seconds': 'Time spent rendering a template, by template.',
+}
+
+
+def header(name, kind):
+  return ['# HELP %s %s' % (name, HELP.get(name, name)), '# TYPE %s %s' % (name, kind)]
+
+
+def format_labels(labels):
+  if not labels:
+    return ''
+  return '{%s}' % ','.join('%s="%s"' % (label, escape(value)) for label, value in labels)
+
+
+def escape(value):
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+  if isinstance(value, float):
+    return repr(value)
+  return str(value)
+
+
+#  Collectors
+#  ----------------------------------------------------------------
+
+def pool_metrics(engine):
+  # read from the pool when scraped; pools without these methods (e.g. SQLite's) are skipped
+  pool = engine.pool
+  samples = []
+  for name, method, help in (
+    ('fyyur_db_pool_size', 'size', 'Connections the pool keeps open.'),
+    ('fyyur_db_pool_checked_out', 'checkedout', 'Connections currently checked out of the pool.'),
+    ('fyyur_db_pool_overflow', 'overflow', 'Connections opened beyond the pool size.'),
+    ('fyyur_db_pool_checked_in', 'checkedin', 'Idle connections in the pool.'),
+  ):
+    if hasattr(pool, method):
+      # overflow() is negative while the pool is not full yet
+      samples.append((name, 'gauge', help, [({}, max(getattr(pool, method)(), 0))]))
+  return samples
+
+
+def cache_metrics(stats):
+  labels = {'backend': stats['backend']}
+  return [
+    ('fyyur_cache_hits_total', 'counter', 'Response cache hits.', [(labels, stats['hits'])]),
+    ('fyyur_cache_misses_total', 'counter', 'Response cache misses.', [(labels, stats['misses'])]),
+    ('fyyur_fragment_cache_hits_total', 'counter', 'Template fragment cache hits.', [(labels, stats['fragment_hits'])]),
+    ('fyyur_fragment_cache_misses_total', 'counter', 'Template fragment cache misses.', [(labels, stats['fragment_misses'])]),
+  ]
@@ -0,0 +1,114 @@
+"""store genres as a genre[] enum array
+
+Revision ID: 3e9b1f7c5a28
+Revises: d41a7c9e2b50
+Create Date: 2026-10-18 11:24:09.570342
+
+"""
+import ast
+import csv
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3e9b1f7c5a28'
+down_revision = 'd41a7c9e2b50'
+branch_labels = None
+depends_on = None
+
+GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop', 'Heavy Metal',
+    'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+)
+genre_enum = postgresql.ENUM(*GENRES, name='genre')
+
+# same expression as the 6c2f4e8a1d3b search index, with genres going through an immutable wrapper
+SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(name::text, '') || ' ' || coalesce(city::text, '') || ' ' || coalesce(state::text, '') || ' ' || coalesce(fyyur_genres_text(genres), ''))"
+OLD_SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(name::text, '') || ' ' || coalesce(city::text, '') || ' ' || coalesce(state::text, '') || ' ' || coalesce(genres::text, ''))"
+
+
+def parse_genres(value):
+    # the string column held whatever the list assigned to it was turned into:
+    # '{Jazz,"Rock n Roll"}' (psycopg2), "['Jazz', 'Rock n Roll']" (repr) or 'Jazz, Rock n Roll'
+    value = (value or '').strip()
+    if not value:
+        return []
+    if value.startswith('{') and value.endswith('}'):
+        genres = next(csv.reader([value[1:-1]], quotechar='"', escapechar='\\', skipinitialspace=True), [])
+    elif value.startswith('['):
+        try:
+            genres = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            # a list cut off by the 120 characters limit of the column
+            genres = [genre.strip(" '\"") for genre in value.strip('[]').split(',')]
+    else:
+        genres = value.split(',')
+    genres = [genre.strip() for genre in genres]
+    # unknown values can't be stored in the enum
+    return [genre for genre in genres if genre in GENRES]
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+    if postgres:
+        genre_enum.create(bind, checkfirst=True)
+        op.execute(
+            "CREATE OR REPLACE FUNCTION fyyur_genres_text(genre[]) RETURNS text "
+            "AS $$ SELECT array_to_string($1::text[], ' ') $$ LANGUAGE sql IMMUTABLE"
+        )
+
+    for table in ('Venue', 'Artist'):
+        rows = bind.execute(sa.text('SELECT id, genres FROM "%s"' % table)).fetchall()
+        op.add_column(table, sa.Column('genres_list', postgresql.ARRAY(genre_enum) if postgres else sa.Text(), nullable=True))
+        genres_list = sa.table(table, sa.column('id', sa.Integer), sa.column('genres_list'))
+        for row in rows:
+            genres = parse_genres(row.genres)
+            if postgres:
+                value = sa.cast(postgresql.array(genres), postgresql.ARRAY(genre_enum)) if genres else sa.text("'{}'::genre[]")
+            else:
+                value = json.dumps(genres)
+            bind.execute(genres_list.update().where(genres_list.c.id == row.id).values(genres_list=value))
+
+        # dropping the column also drops the search index built on it
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+            batch_op.alter_column('genres_list', new_column_name='genres')
+        if postgres:
+            op.create_index('ix_%s_genres' % table, table, ['genres'], postgresql_using='gin')
+            op.execute('CREATE INDEX "ix_{0}_search" ON "{0}" USING gin ({1})'.format(table, SEARCH_DOCUMENT))
+        else:
+            op.create_index('ix_%s_genres' % table, table, ['genres'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_%s_genres' % table, table_name=table)
+        rows = bind.execute(sa.text('SELECT id, genres FROM "%s"' % table)).fetchall()
+        op.add_column(table, sa.Column('genres_string', sa.String(length=120), nullable=True))
+        genres_string = sa.table(table, sa.column('id', sa.Integer), sa.column('genres_string', sa.String))
+        for row in rows:
+            genres = row.genres
+            if not postgres:
+                genres = json.loads(genres) if genres else []
+            elif isinstance(genres, str):
+                genres = parse_genres(genres)
+            value = '{%s}' % ','.join('"%s"' % genre if ' ' in genre else genre for genre in genres or [])
+            bind.execute(genres_string.update().where(genres_string.c.id == row.id).values(genres_string=value[:120]))
+
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+            batch_op.alter_column('genres_string', new_column_name='genres')
+        if postgres:
+            op.execute('CREATE INDEX "ix_{0}_search" ON "{0}" USING gin ({1})'.format(table, OLD_SEARCH_DOCUMENT))
+
+    if postgres:
+        op.execute('DROP FUNCTION IF EXISTS fyyur_genres_text(genre[])')
+        genre_enum.drop(bind, checkfirst=True)
@@ -0,0 +1,30 @@
+"""indexes of the paginated /venues & /artists listings
+
+Revision ID: 5b8e2d7f9a31
+Revises: e83a0b6d4c17
+Create Date: 2026-10-18 15:02:44.180397
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2d7f9a31'
+down_revision = 'e83a0b6d4c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.create_index('ix_%s_name_id' % table, table, ['name', 'id'], unique=False)
+        op.create_index('ix_%s_upcoming_shows_count' % table, table, [sa.text('upcoming_shows_count DESC'), 'name', 'id'], unique=False)
+    op.create_index('ix_Artist_city_state', 'Artist', ['city', 'state'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_city_state', table_name='Artist')
+    for table in ('Artist', 'Venue'):
+        op.drop_index('ix_%s_upcoming_shows_count' % table, table_name=table)
+        op.drop_index('ix_%s_name_id' % table, table_name=table)
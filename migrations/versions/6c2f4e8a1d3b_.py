@@ -0,0 +1,35 @@
+"""search indexes for venues & artists
+
+Revision ID: 6c2f4e8a1d3b
+Revises: 9f6bf27a34d0
+Create Date: 2026-10-18 09:12:41.318207
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2f4e8a1d3b'
+down_revision = '9f6bf27a34d0'
+branch_labels = None
+depends_on = None
+
+# keep the expression in sync with search.Searcher, the planner only uses the index for the exact same expression
+SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(name::text, '') || ' ' || coalesce(city::text, '') || ' ' || coalesce(state::text, '') || ' ' || coalesce(genres::text, ''))"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.execute('CREATE INDEX "ix_{0}_search" ON "{0}" USING gin ({1})'.format(table, SEARCH_DOCUMENT))
+        op.execute('CREATE INDEX "ix_{0}_name_trgm" ON "{0}" USING gin (name gin_trgm_ops)'.format(table))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('Venue', 'Artist'):
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_name_trgm"'.format(table))
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_search"'.format(table))
@@ -0,0 +1,30 @@
+"""updated_at modification timestamps for incremental exports
+
+Revision ID: 7a05c3d8e614
+Revises: 3e9b1f7c5a28
+Create Date: 2026-10-18 12:40:55.112870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a05c3d8e614'
+down_revision = '3e9b1f7c5a28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        # the existing rows get the time of the migration
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+        op.create_index('ix_%s_updated_at' % table, table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_index('ix_%s_updated_at' % table, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,33 @@
+"""prefix index on the lowercased names for the autocomplete
+
+Revision ID: 8d1f3a6c2b47
+Revises: 5b8e2d7f9a31
+Create Date: 2026-10-18 17:40:12.604531
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1f3a6c2b47'
+down_revision = '5b8e2d7f9a31'
+branch_labels = None
+depends_on = None
+
+# keep the expression in sync with search.Searcher: a btree in the "C" collation serves both the LIKE 'ab%' range
+# (as text_pattern_ops would) and the ORDER BY of the short autocomplete terms
+NAME_PREFIX = 'lower(name) COLLATE "C"'
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('Venue', 'Artist'):
+        op.execute('CREATE INDEX "ix_{0}_name_prefix" ON "{0}" (({1}))'.format(table, NAME_PREFIX))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('Venue', 'Artist'):
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_name_prefix"'.format(table))
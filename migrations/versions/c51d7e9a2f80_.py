@@ -0,0 +1,48 @@
+"""upcoming & past show counters on Venue & Artist
+
+Revision ID: c51d7e9a2f80
+Revises: 7a05c3d8e614
+Create Date: 2026-10-18 13:05:12.408311
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c51d7e9a2f80'
+down_revision = '7a05c3d8e614'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('ShowCounters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # the counters start out exact as of now (the app compares start times with its local datetime.now())
+    rolled_at = datetime.now()
+    for table, foreign_key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.get_bind().execute(sa.text(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT COUNT(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND "Show".start_time > :rolled_at), '
+            'past_shows_count = (SELECT COUNT(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND "Show".start_time <= :rolled_at)'
+            .format(table=table, fk=foreign_key)
+        ), {'rolled_at': rolled_at})
+    op.get_bind().execute(sa.text('INSERT INTO "ShowCounters" (id, rolled_at) VALUES (1, :rolled_at)'), {'rolled_at': rolled_at})
+
+
+def downgrade():
+    op.drop_table('ShowCounters')
+    for table in ('Artist', 'Venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
@@ -0,0 +1,29 @@
+"""indexes for the Show & Venue hot paths
+
+Revision ID: d41a7c9e2b50
+Revises: 6c2f4e8a1d3b
+Create Date: 2026-10-18 10:03:27.804116
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a7c9e2b50'
+down_revision = '6c2f4e8a1d3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_start_time', 'Show', ['start_time'], unique=False)
+    op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_city_state', table_name='Venue')
+    op.drop_index('ix_Show_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
@@ -0,0 +1,594 @@
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from sqlalchemy import func
+from extensions import db, cache, jobs
+from genres import GenreList
+from search import Searcher
+from formatting import parse_datetime
+from listing import sort_columns, genre_filters, paginate, listing_count
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+      # /venues groups & orders the directory by city & state
+      db.Index('ix_Venue_city_state', 'city', 'state'),
+      db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+      # the keyset pages of /venues sorted by name & by upcoming shows (see listing.py)
+      db.Index('ix_Venue_name_id', 'name', 'id'),
+      db.Index('ix_Venue_upcoming_shows_count', db.text('upcoming_shows_count DESC'), 'name', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    genres = db.Column(GenreList)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    # set on insert & on every update, incremental exports select the rows changed since the last one
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, server_default=db.func.now(), onupdate=db.func.now())
+    # shows starting after / up to ShowCounters.rolled_at, maintained by Show.addShow & `flask counters` (see ShowCounters)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    venue_shows = db.relationship('Show', backref='Venue', lazy="dynamic")
+    # reference for Dynamic relationship loaders: https://docs.sqlalchemy.org/en/13/orm/collections.html
+
+    # TODO - Done: implement any missing fields, as a database migration using Flask-Migrate
+
+    # initializing data - constructor
+    def __init__(self, name, genres, city, state, address, phone, website, image_link, facebook_link):
+      self.name = name
+      self.genres = genres
+      self.city = city
+      self.state = state
+      self.address = address
+      self.phone = phone
+      self.website = website
+      self.image_link = image_link
+      self.facebook_link = facebook_link
+
+    def addVenue(self):
+      db.session.add(self)
+      db.session.commit()
+      venue_search.add(self)
+      cache.invalidate('venues', 'venue:%d' % self.id)
+
+    def updateVenue(self):
+      db.session.commit()
+      venue_search.add(self)
+      cache.invalidate('venues', 'venue:%d' % self.id)
+
+    def deleteVenue(self):
+      venue_id = self.id
+      db.session.delete(self)
+      db.session.commit()
+      venue_search.remove(venue_id)
+      cache.invalidate('venues', 'venue:%d' % venue_id)
+
+    def getDetails(self):
+      return {
+        'id': self.id,
+        'name': self.name,
+        'genres': self.genres,
+        'city': self.city,
+        'state': self.state,
+        'address': self.address,
+        'phone': self.phone,
+        'website': self.website,
+        'image_link': self.image_link,
+        'facebook_link': self.facebook_link
+      }
+    
+    def getShortDisplay(self):
+      return {
+        'id': self.id,
+        'name': self.name
+      }
+
+    @staticmethod
+    def getListing(sort='city', limit=50, after=None, letter=None, genre=None):
+      # SQL query:
+      # SELECT id, name, city, state, upcoming_shows_count FROM Venue [WHERE genres @> ARRAY[genre]]
+      # AND <after the cursor> ORDER BY <sort columns>, id LIMIT limit + 1
+      # a keyset page of the directory (see listing.py); the upcoming shows are counted ahead of time (see ShowCounters)
+      query_venues = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count) \
+        .filter(*genre_filters(db, Venue, genre).values())
+      rows, next_cursor = paginate(db, query_venues, sort_columns(Venue, sort), limit, after, letter)
+      return [{
+        'id': venue.id,
+        'name': venue.name,
+        'city': venue.city,
+        'state': venue.state,
+        'num_upcoming_shows': venue.upcoming_shows_count
+      } for venue in rows], next_cursor
+
+    @staticmethod
+    def countListing(genre=None):
+      # (count, estimated), see listing.py
+      return listing_count(db, cache, Venue, genre_filters(db, Venue, genre), 'venues')
+
+    @staticmethod
+    def getDetailsWithShows(venue_id, current_time):
+      # SQL query:
+      # SELECT v.*, s.start_time, a.id, a.name, a.image_link FROM Venue AS v
+      # LEFT OUTER JOIN Show AS s ON s.venue_id = v.id LEFT OUTER JOIN Artist AS a ON a.id = s.artist_id
+      # WHERE v.id = venue_id ORDER BY s.start_time
+      # one row per show (or a single row with NULL show columns when the venue has no show)
+      rows = db.session.query(Venue, Show.start_time, Show.artist_id, Artist.name, Artist.image_link) \
+        .outerjoin(Show, Show.venue_id == Venue.id) \
+        .outerjoin(Artist, Artist.id == Show.artist_id) \
+        .filter(Venue.id == venue_id) \
+        .order_by(Show.start_time) \
+        .all()
+      if not rows:
+        return None
+
+      shows = [{
+        'artist_id': artist_id,
+        'artist_name': artist_name,
+        'artist_image_link': artist_image_link,
+        'start_time': start_time
+      } for _, start_time, artist_id, artist_name, artist_image_link in rows if start_time is not None]
+      return dict(Venue.getDetails(rows[0][0]), **partitionShows(shows, current_time))
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+      db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+      # the keyset pages of /artists sorted by name, city & upcoming shows (see listing.py)
+      db.Index('ix_Artist_name_id', 'name', 'id'),
+      db.Index('ix_Artist_city_state', 'city', 'state'),
+      db.Index('ix_Artist_upcoming_shows_count', db.text('upcoming_shows_count DESC'), 'name', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    genres = db.Column(GenreList)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, server_default=db.func.now(), onupdate=db.func.now())
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    artist_shows = db.relationship('Show', backref='Artist', lazy="dynamic")
+    # reference for Dynamic relationship loaders: https://docs.sqlalchemy.org/en/13/orm/collections.html
+
+    # TODO - Done : implement any missing fields, as a database migration using Flask-Migrate
+
+    # initializing data - constructor
+    def __init__(self, name, city, state, phone, website, genres, image_link, facebook_link):
+      self.name = name
+      self.city = city
+      self.state = state
+      self.phone = phone
+      self.website = website
+      self.genres = genres
+      self.image_link = image_link
+      self.facebook_link = facebook_link
+
+    def addArtist(self):
+      db.session.add(self)
+      db.session.commit()
+      artist_search.add(self)
+      cache.invalidate('artists', 'artist:%d' % self.id)
+
+    def updateArtist(self):
+      db.session.commit()
+      artist_search.add(self)
+      cache.invalidate('artists', 'artist:%d' % self.id)
+
+    def deleteArtist(self):
+      artist_id = self.id
+      db.session.delete(self)
+      db.session.commit()
+      artist_search.remove(artist_id)
+      cache.invalidate('artists', 'artist:%d' % artist_id)
+
+    def getDetails(self):
+      return {
+        'id': self.id,
+        'name': self.name,
+        'city': self.city,
+        'state': self.state,
+        'phone': self.phone,
+        'website': self.website,
+        'genres': self.genres,
+        'image_link': self.image_link,
+        'facebook_link': self.facebook_link
+      }
+
+    def getShortDisplay(self):
+      return {
+        'id': self.id,
+        'name': self.name
+      }
+
+    @staticmethod
+    def getListing(sort='name', limit=50, after=None, letter=None, genre=None):
+      # SQL query:
+      # SELECT id, name, city, state, upcoming_shows_count FROM Artist [WHERE genres @> ARRAY[genre]]
+      # AND <after the cursor> ORDER BY <sort columns>, id LIMIT limit + 1
+      # a keyset page (see listing.py) of plain rows (artist.id, artist.name, ...): no Artist instances
+      # to build, instrument & track in the session
+      query_artists = db.session.query(Artist.id, Artist.name, Artist.city, Artist.state, Artist.upcoming_shows_count) \
+        .filter(*genre_filters(db, Artist, genre).values())
+      return paginate(db, query_artists, sort_columns(Artist, sort), limit, after, letter)
+
+    @staticmethod
+    def countListing(genre=None):
+      # (count, estimated), see listing.py
+      return listing_count(db, cache, Artist, genre_filters(db, Artist, genre), 'artists')
+
+    @staticmethod
+    def getDetailsWithShows(artist_id, current_time):
+      # SQL query:
+      # SELECT a.*, s.start_time, v.id, v.name, v.image_link FROM Artist AS a
+      # LEFT OUTER JOIN Show AS s ON s.artist_id = a.id LEFT OUTER JOIN Venue AS v ON v.id = s.venue_id
+      # WHERE a.id = artist_id ORDER BY s.start_time
+      rows = db.session.query(Artist, Show.start_time, Show.venue_id, Venue.name, Venue.image_link) \
+        .outerjoin(Show, Show.artist_id == Artist.id) \
+        .outerjoin(Venue, Venue.id == Show.venue_id) \
+        .filter(Artist.id == artist_id) \
+        .order_by(Show.start_time) \
+        .all()
+      if not rows:
+        return None
+
+      shows = [{
+        'venue_id': venue_id,
+        'venue_name': venue_name,
+        'venue_image_link': venue_image_link,
+        'start_time': start_time
+      } for _, start_time, venue_id, venue_name, venue_image_link in rows if start_time is not None]
+      return dict(Artist.getDetails(rows[0][0]), **partitionShows(shows, current_time))
+
+# TODO - Done: Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Show(db.Model):
+  __tablename__ = 'Show'
+  __table_args__ = (
+    # the venue & artist pages filter their shows by venue/artist and compare the start time,
+    # /venues & /shows filter or order every show by its start time
+    db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_Show_start_time', 'start_time'),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+  start_time = db.Column(db.DateTime, nullable=False)
+  updated_at = db.Column(db.DateTime, nullable=False, index=True, server_default=db.func.now(), onupdate=db.func.now())
+
+  # initializing data - constructor
+  def __init__(self, venue_id, artist_id, start_time):
+    self.venue_id = venue_id
+    self.artist_id = artist_id
+    self.start_time = start_time
+
+  def addShow(self):
+    if isinstance(self.start_time, str):
+      # as posted by the form
+      self.start_time = parse_datetime(self.start_time)
+    db.session.add(self)
+    db.session.flush()
+    # the counters of the venue & the artist are recounted off the request path, once the show is committed
+    jobs.enqueue('counters.recount', int(self.venue_id), int(self.artist_id), key='recount:show:%d' % self.id)
+    db.session.commit()
+    # the invalidation stays here: it is one version token write per namespace, and the pages the user is redirected
+    # to must show the new show; the search indexes hold no shows
+    cache.invalidate('shows', 'venue:%d' % self.venue_id, 'artist:%d' % self.artist_id)
+
+  @staticmethod
+  def parseSchedule(rows):
+    # rows of venue_id, artist_id & start_time (form strings or JSON values) -> (shows, errors), row numbers from 0
+    shows, errors = [], []
+    for number, row in enumerate(rows):
+      try:
+        start_time = row['start_time']
+        if isinstance(start_time, str):
+          start_time = parse_datetime(start_time)
+        if not isinstance(start_time, datetime) or start_time.tzinfo is not None:
+          # start times are stored without a timezone
+          raise TypeError(start_time)
+        shows.append({'venue_id': int(row['venue_id']), 'artist_id': int(row['artist_id']), 'start_time': start_time})
+      except (KeyError, TypeError, ValueError, OverflowError):
+        errors.append({'row': number, 'error': 'needs an integer venue_id & artist_id and a start_time'})
+    return shows, errors
+
+  @staticmethod
+  def checkSchedule(shows, slot):
+    # a venue hosts one show at a time: a show starting less than slot (a timedelta) before or after another
+    # at the same venue, in the batch or in the database, is a double booking; returns the errors, row numbers from 0
+    # SQL queries:
+    # SELECT id FROM Venue WHERE id IN (venue_ids) FOR UPDATE
+    # SELECT id FROM Artist WHERE id IN (artist_ids)
+    # SELECT venue_id, start_time FROM Show
+    # WHERE (venue_id = v1 AND start_time > t1 - slot AND start_time < t1 + slot) OR (venue_id = v2 AND ...) OR ...
+    # the venue rows stay locked until the batch commits, so two batches can't book the same venue at once;
+    # every range of the last query is a scan of ix_Show_venue_id_start_time
+    errors = []
+    venue_ids = set(show['venue_id'] for show in shows)
+    artist_ids = set(show['artist_id'] for show in shows)
+    venues = set(db.session.scalars(db.select(Venue.id).where(Venue.id.in_(venue_ids)).with_for_update()))
+    artists = set(db.session.scalars(db.select(Artist.id).where(Artist.id.in_(artist_ids))))
+    for number, show in enumerate(shows):
+      if show['venue_id'] not in venues:
+        errors.append({'row': number, 'error': 'venue %d does not exist' % show['venue_id']})
+      if show['artist_id'] not in artists:
+        errors.append({'row': number, 'error': 'artist %d does not exist' % show['artist_id']})
+
+    ordered = sorted(range(len(shows)), key=lambda number: (shows[number]['venue_id'], shows[number]['start_time']))
+    for previous, number in zip(ordered, ordered[1:]):
+      if shows[previous]['venue_id'] == shows[number]['venue_id'] \
+          and shows[number]['start_time'] - shows[previous]['start_time'] < slot:
+        errors.append({'row': number, 'error': 'venue %d is already booked by row %d at %s' % (
+          shows[number]['venue_id'], previous, shows[previous]['start_time'])})
+
+    ranges = [
+      db.and_(Show.venue_id == show['venue_id'], Show.start_time > show['start_time'] - slot, Show.start_time < show['start_time'] + slot)
+      for show in shows if show['venue_id'] in venues
+    ]
+    booked = db.session.query(Show.venue_id, Show.start_time).filter(db.or_(*ranges)).all() if ranges else []
+    for number, show in enumerate(shows):
+      for venue_id, start_time in booked:
+        if venue_id == show['venue_id'] and abs(start_time - show['start_time']) < slot:
+          errors.append({'row': number, 'error': 'venue %d is already booked at %s' % (venue_id, start_time)})
+          break
+    return sorted(errors, key=lambda error: error['row'])
+
+  @staticmethod
+  def scheduleShows(shows, slot):
+    # all the shows (of parseSchedule) or none: returns no errors once they are committed
+    errors = Show.checkSchedule(shows, slot)
+    if errors:
+      # releases the locks of checkSchedule
+      db.session.rollback()
+      return errors
+    Show.addShows(shows)
+    return []
+
+  @staticmethod
+  def addShows(shows):
+    # SQL query:
+    # INSERT INTO Show (venue_id, artist_id, start_time) VALUES (...), (...), ... RETURNING id
+    # a single transaction, the ids are set on the shows (dicts); the counters of every venue & artist of the batch
+    # are recounted once by a background job
+    # the ids are returned in the order of the shows, so they match even when two shows have the same venue & start
+    # time (e.g. with SHOW_SLOT_MINUTES = 0); PostgreSQL keeps the batch a single statement, SQLite (no insert
+    # sentinel) runs one INSERT per show
+    inserted = db.session.execute(db.insert(Show).returning(Show.id, sort_by_parameter_order=True), shows).all()
+    recounted = {}
+    for show, (show_id,) in zip(shows, inserted):
+      show['id'] = show_id
+      recounted.setdefault((show['venue_id'], show['artist_id']), show['id'])
+    for (venue_id, artist_id), show_id in recounted.items():
+      jobs.enqueue('counters.recount', venue_id, artist_id, key='recount:show:%d' % show_id)
+    db.session.commit()
+    namespaces = set(['venue:%d' % show['venue_id'] for show in shows] + ['artist:%d' % show['artist_id'] for show in shows])
+    cache.invalidate('shows', *namespaces)
+
+  def getDetails(self):
+    return {
+      'id': self.id,
+      'venue_id': self.venue_id,
+      'venue_name': self.Venue.name,
+      'artist_id': self.artist_id,
+      'artist_name': self.Artist.name,
+      'artist_image_link': self.Artist.image_link,
+      'start_time': self.start_time
+    }
+
+  @staticmethod
+  def getFeedQuery(after=None):
+    # keyset pagination over (start_time, id): the page starts right after the last show of the previous page,
+    # so the database never has to skip over (OFFSET) the rows already displayed
+    # SQL query:
+    # SELECT s.id, s.start_time, s.venue_id, v.name, s.artist_id, a.name, a.image_link
+    # FROM Show AS s JOIN Venue AS v ON v.id = s.venue_id JOIN Artist AS a ON a.id = s.artist_id
+    # WHERE (s.start_time, s.id) > (after_start_time, after_id) ORDER BY s.start_time, s.id LIMIT limit + 1
+    query_shows = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+      ) \
+      .join(Venue, Venue.id == Show.venue_id) \
+      .join(Artist, Artist.id == Show.artist_id)
+    if after:
+      after_start_time, after_id = after
+      query_shows = query_shows.filter(db.or_(
+        Show.start_time > after_start_time,
+        db.and_(Show.start_time == after_start_time, Show.id > after_id)
+      ))
+    return query_shows.order_by(Show.start_time, Show.id)
+
+  @staticmethod
+  def getFeed(after=None, limit=30):
+    # one extra row tells us whether there is a next page without a COUNT(*)
+    rows = Show.getFeedQuery(after).limit(limit + 1).all()
+
+    shows = [row._asdict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+      last_show = shows[-1]
+      next_cursor = (last_show['start_time'], last_show['id'])
+    return shows, next_cursor
+
+  @staticmethod
+  def encodeCursor(cursor):
+    start_time, show_id = cursor
+    return start_time.strftime('%Y-%m-%dT%H:%M:%S.%f') + '_' + str(show_id)
+
+  @staticmethod
+  def decodeCursor(value):
+    # raises ValueError on a malformed cursor
+    start_time, show_id = value.rsplit('_', 1)
+    return datetime.strptime(start_time, '%Y-%m-%dT%H:%M:%S.%f'), int(show_id)
+
+  def getArtistDetails(self):
+    return {
+      'artist_id': self.artist_id,
+      'artist_name': self.Artist.name,
+      'artist_image_link': self.Artist.image_link,
+      'start_time': self.start_time
+    }
+  
+  def getVenueDetails(self):
+    return {
+      'venue_id': self.venue_id,
+      'venue_name': self.Venue.name,
+      'venue_image_link': self.Venue.image_link,
+      'start_time': self.start_time
+    }
+
+class ShowCounters(db.Model):
+  # Venue & Artist.upcoming_shows_count / past_shows_count count the shows starting after / up to rolled_at
+  # (a single row). Show.addShow has the venue & artist recounted by a background job, rollForward moves the shows that started
+  # since rolled_at from upcoming to past & advances rolled_at (`flask counters roll`, every minute from cron),
+  # reconcile recounts everything from Show (`flask counters reconcile`, after bulk imports & nightly).
+  __tablename__ = 'ShowCounters'
+  id = db.Column(db.Integer, primary_key=True)
+  rolled_at = db.Column(db.DateTime, nullable=False)
+
+  COUNTED = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+  @staticmethod
+  def countedValues(model, foreign_key, boundary):
+    # upcoming_shows_count = (SELECT COUNT(*) FROM Show WHERE <fk> = <model>.id AND start_time > boundary), past: <=
+    counted = lambda condition: db.select(func.count(Show.id)) \
+      .where(foreign_key == model.id, condition) \
+      .scalar_subquery()
+    return {
+      'upcoming_shows_count': counted(Show.start_time > boundary),
+      'past_shows_count': counted(Show.start_time <= boundary)
+    }
+
+  @staticmethod
+  def counterValues(model, **values):
+    # the SET of an update of the counters only: updated_at is set to itself, otherwise its onupdate would mark
+    # the row as changed & the incremental exports (`flask export --since`) would export it again
+    return dict(values, updated_at=model.updated_at)
+
+  @staticmethod
+  def recount(venue_id, artist_id):
+    # SQL query:
+    # UPDATE Venue SET upcoming_shows_count = (SELECT COUNT(*) FROM Show WHERE venue_id = Venue.id AND start_time > rolled_at),
+    #   past_shows_count = (... AND start_time <= rolled_at) WHERE id = venue_id (same for the artist)
+    # the 'counters.recount' job of Show.addShow: a recount rather than an increment, so running it twice is harmless
+    rolled_at = db.select(ShowCounters.rolled_at).scalar_subquery()
+    for (model, foreign_key), entity_id in zip(ShowCounters.COUNTED, (venue_id, artist_id)):
+      db.session.execute(db.update(model)
+        .where(model.id == entity_id)
+        .values(**ShowCounters.counterValues(model, **ShowCounters.countedValues(model, foreign_key, rolled_at))))
+    db.session.commit()
+    cache.invalidate('venues', 'artists')
+
+  @staticmethod
+  def rollForward(current_time):
+    # SQL query:
+    # UPDATE Venue SET upcoming_shows_count = upcoming_shows_count - moved.count, past_shows_count = past_shows_count + moved.count
+    # FROM (SELECT venue_id, COUNT(*) AS count FROM Show WHERE start_time > rolled_at AND start_time <= current_time
+    #       GROUP BY venue_id) AS moved WHERE Venue.id = moved.venue_id
+    # (same for the artists), then UPDATE ShowCounters SET rolled_at = current_time WHERE rolled_at = <the one read>
+    # the conditional update of rolled_at makes concurrent runs safe: the second one finds 0 rows & rolls back
+    rolled_at = db.session.query(ShowCounters.rolled_at).scalar()
+    if rolled_at is None or current_time <= rolled_at:
+      return 0
+    updated_rows = 0
+    for model, foreign_key in ShowCounters.COUNTED:
+      moved = db.session.query(foreign_key.label('entity_id'), func.count(Show.id).label('count')) \
+        .filter(Show.start_time > rolled_at, Show.start_time <= current_time) \
+        .group_by(foreign_key) \
+        .subquery()
+      result = db.session.execute(db.update(model).where(model.id == moved.c.entity_id).values(**ShowCounters.counterValues(model,
+        upcoming_shows_count=model.upcoming_shows_count - moved.c.count,
+        past_shows_count=model.past_shows_count + moved.c.count
+      )))
+      updated_rows += result.rowcount
+    advanced = db.session.execute(db.update(ShowCounters)
+      .where(ShowCounters.rolled_at == rolled_at)
+      .values(rolled_at=current_time))
+    if advanced.rowcount != 1:
+      db.session.rollback()
+      return 0
+    db.session.commit()
+    if updated_rows:
+      cache.invalidate('venues', 'artists')
+    # the number of venues & artists whose counters changed
+    return updated_rows
+
+  @staticmethod
+  def reconcile(current_time):
+    # SQL query:
+    # UPDATE Venue SET upcoming_shows_count = (SELECT COUNT(*) FROM Show WHERE venue_id = Venue.id AND start_time > current_time),
+    #   past_shows_count = (SELECT COUNT(*) FROM Show WHERE venue_id = Venue.id AND start_time <= current_time)
+    # WHERE upcoming_shows_count != (<the same count>) OR past_shows_count != (<the same count>)
+    # (same for the artists) & rolled_at = current_time, in one transaction
+    # only the rows whose counters are wrong are written: a nightly run over a right catalog updates nothing;
+    # returns the number of venues & artists whose counters were fixed
+    updated_rows = 0
+    for model, foreign_key in ShowCounters.COUNTED:
+      counted = ShowCounters.countedValues(model, foreign_key, current_time)
+      result = db.session.execute(db.update(model)
+        .where(db.or_(*[getattr(model, column) != value for column, value in counted.items()]))
+        .values(**ShowCounters.counterValues(model, **counted)))
+      updated_rows += result.rowcount
+    if db.session.query(ShowCounters).first() is None:
+      db.session.add(ShowCounters(rolled_at=current_time))
+    else:
+      db.session.execute(db.update(ShowCounters).values(rolled_at=current_time))
+    db.session.commit()
+    if updated_rows:
+      cache.invalidate('venues', 'artists')
+    return updated_rows
+
+jobs.register('counters.recount', ShowCounters.recount)
+
+class Job(db.Model):
+  # a background job of the 'database' backend, run by `flask jobs worker` (see jobs.py)
+  __tablename__ = 'Job'
+  __table_args__ = (
+    # the workers look for the due pending jobs
+    db.Index('ix_Job_status_run_at', 'status', 'run_at'),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  name = db.Column(db.String(120), nullable=False)
+  # JSON list of the arguments
+  args = db.Column(db.Text, nullable=False)
+  # idempotency key: a job is queued once per key
+  key = db.Column(db.String(255), unique=True)
+  # pending, running, done or failed
+  status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')
+  attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  run_at = db.Column(db.DateTime, nullable=False)
+  claimed_at = db.Column(db.DateTime)
+  last_error = db.Column(db.Text)
+  created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+  updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+
+jobs.use_table(Job)
+
+def partitionShows(shows, current_time):
+  # splits shows ordered by start time into upcoming & past ones against a single timestamp,
+  # the past shows are listed from the most recent one
+  upcoming_shows = [show for show in shows if show['start_time'] > current_time]
+  past_shows = [show for show in reversed(shows) if show['start_time'] <= current_time]
+  return {
+    'upcoming_shows': upcoming_shows,
+    'upcoming_shows_count': len(upcoming_shows),
+    'past_shows': past_shows,
+    'past_shows_count': len(past_shows)
+  }
+
+# full-text search over name, city, state & genres (see search.py)
+venue_search = Searcher(db, Venue)
+artist_search = Searcher(db, Artist)
@@ -0,0 +1,142 @@
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+# Sends the reads of the read-only requests to the replicas of
+# SQLALCHEMY_REPLICA_URIS, so that the primary only serves the form posts.
+#
+# A request is read-only when it is a GET/HEAD, or when its view is decorated
+# with @read_only (the searches are POSTs that only read). Every read-only
+# request picks one replica, round robin, and all its SELECTs run there;
+# statements that write & ORM flushes always go to the primary. A replica is
+# health checked with `SELECT 1` at most every REPLICA_HEALTH_CHECK_INTERVAL
+# seconds and skipped while the check fails; with no healthy replica the
+# request reads from the primary.
+#
+# Read-your-writes: a request that may have written sets a short lived cookie,
+# and the client reads from the primary for REPLICA_STICKY_SECONDS, the time
+# the replicas need to catch up, so it sees its own changes right away.
+
+import itertools
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.sql.elements import TextClause
+
+STICKY_COOKIE = 'fyyur_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def read_only(view):
+  # @read_only under the route decorator(s) of a view that isn't a GET but never writes
+  view.read_only = True
+  return view
+
+
+def is_select(clause):
+  if clause is None:
+    return False
+  if isinstance(clause, TextClause):
+    return clause.text.lstrip().upper().startswith('SELECT')
+  return bool(getattr(clause, 'is_select', False))
+
+
+class RoutingSession(Session):
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    if bind is None and not self._flushing and is_select(clause) and has_request_context():
+      replica = g.get('db_replica')
+      if replica is not None:
+        return replica
+    return Session.get_bind(self, mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class Replica(object):
+
+  def __init__(self, name, engine, check_interval):
+    self.name = name
+    self.engine = engine
+    self.check_interval = check_interval
+    self.healthy = False
+    self.next_check = 0
+    self.lock = threading.Lock()
+
+  def available(self):
+    # one thread runs a due check, the others go on with the last result
+    if time.time() >= self.next_check and self.lock.acquire(False):
+      try:
+        self.check()
+      finally:
+        self.lock.release()
+    return self.healthy
+
+  def check(self):
+    try:
+      with self.engine.connect() as connection:
+        # not counted in the query budget of the request that happens to run the check
+        connection.execution_options(uninstrumented=True).exec_driver_sql('SELECT 1')
+      if not self.healthy:
+        current_app.logger.info('replica %s is healthy', self.name)
+      self.healthy = True
+    except Exception as error:
+      current_app.logger.warning('replica %s failed its health check: %s', self.name, error)
+      self.healthy = False
+    self.next_check = time.time() + self.check_interval
+
+
+class ReplicaRouter(object):
+
+  def __init__(self, app=None):
+    self.replicas = []
+    self.counter = itertools.count()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    check_interval = app.config.get('REPLICA_HEALTH_CHECK_INTERVAL', 30)
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    self.replicas = [
+      Replica('%d' % position, create_engine(uri, **(options if not uri.startswith('sqlite') else {})), check_interval)
+      for position, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or ())
+    ]
+    self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+    if self.replicas:
+      app.before_request(self.before_request)
+      app.after_request(self.after_request)
+    app.extensions['replicas'] = self
+
+  def pick(self):
+    # round robin over the healthy replicas
+    count = len(self.replicas)
+    for _ in range(count):
+      replica = self.replicas[next(self.counter) % count]
+      if replica.available():
+        return replica
+    return None
+
+  def is_read_only(self):
+    if request.method in SAFE_METHODS:
+      return True
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'read_only', False)
+
+  def before_request(self):
+    if self.is_read_only() and not request.cookies.get(STICKY_COOKIE):
+      replica = self.pick()
+      if replica is not None:
+        g.db_replica = replica.engine
+        g.db_replica_name = replica.name
+
+  def after_request(self, response):
+    if not self.is_read_only():
+      response.set_cookie(STICKY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+    return response
+
+
+def replica_metrics(router):
+  if not router.replicas:
+    return []
+  return [('fyyur_db_replica_healthy', 'gauge', 'Whether the replica passed its last health check.',
+    [({'replica': replica.name}, int(replica.healthy)) for replica in router.replicas])]
@@ -0,0 +1,302 @@
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+# Venue & artist search across name, city, state & genres.
+#
+# On PostgreSQL the search runs against the GIN indexes created by the
+# 6c2f4e8a1d3b migration (rebuilt by 3e9b1f7c5a28 when genres became a
+# genre[]): a 'simple' tsvector expression index for ranked,
+# prefix matching on whole words, and a pg_trgm index on name so that
+# substring matches (the old ILIKE '%term%' behaviour) don't scan the table.
+# A term shorter than MIN_INFIX_LENGTH has no trigram to look up, so the
+# autocomplete only matches it against the beginning of the names, a range of
+# the lower(name) COLLATE "C" btree of the 8d1f3a6c2b47 migration.
+#
+# Any other database (SQLite while testing) falls back to an in-memory
+# inverted index built from the table on first use and kept up to date by the
+# models' add/update/delete methods. Those only run in the process that wrote:
+# every SEARCH_INDEX_CHECK_INTERVAL seconds at most, the index compares the
+# row count & latest updated_at of the table with the ones it was built from,
+# and is rebuilt when another process (a web worker, `flask import`) changed
+# the table.
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.sql import text
+
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+# genre[] -> text isn't immutable (enum output), so the index goes through the fyyur_genres_text() wrapper
+COLUMN_DOCUMENTS = {
+  'genres': "fyyur_genres_text(genres)"
+}
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+# shortest autocomplete term matched anywhere in the names on PostgreSQL (pg_trgm indexes 3 character trigrams)
+MIN_INFIX_LENGTH = 3
+
+
+def tokenize(value):
+  if not value:
+    return []
+  if isinstance(value, (list, tuple)):
+    value = ' '.join(value)
+  return TOKEN_PATTERN.findall(str(value).lower())
+
+
+class InvertedIndex(object):
+  # token -> ids of the documents containing it, plus a sorted list of the tokens for prefix lookups
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.postings = {}
+    self.sorted_tokens = []
+    # (lowercased name, id) of every document & (word of the name, lowercased name, id), sorted, for the autocomplete
+    self.sorted_names = []
+    self.sorted_name_words = []
+    self.documents = {}
+
+  def clear(self):
+    with self.lock:
+      self.postings = {}
+      self.sorted_tokens = []
+      self.sorted_names = []
+      self.sorted_name_words = []
+      self.documents = {}
+
+  def add(self, doc_id, name, fields):
+    with self.lock:
+      self._remove(doc_id)
+      name_tokens = set(tokenize(name))
+      tokens = set(name_tokens)
+      for value in fields:
+        tokens.update(tokenize(value))
+      self.documents[doc_id] = (name or '', name_tokens, tokens)
+      insort(self.sorted_names, ((name or '').lower(), doc_id))
+      for token in name_tokens:
+        insort(self.sorted_name_words, (token, (name or '').lower(), doc_id))
+      for token in tokens:
+        if token not in self.postings:
+          self.postings[token] = set()
+          self.sorted_tokens.insert(bisect_left(self.sorted_tokens, token), token)
+        self.postings[token].add(doc_id)
+
+  def remove(self, doc_id):
+    with self.lock:
+      self._remove(doc_id)
+
+  def _remove(self, doc_id):
+    document = self.documents.pop(doc_id, None)
+    if document is None:
+      return
+    del self.sorted_names[bisect_left(self.sorted_names, (document[0].lower(), doc_id))]
+    for token in document[1]:
+      del self.sorted_name_words[bisect_left(self.sorted_name_words, (token, document[0].lower(), doc_id))]
+    for token in document[2]:
+      ids = self.postings[token]
+      ids.discard(doc_id)
+      if not ids:
+        del self.postings[token]
+        del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+
+  def _prefix_matches(self, prefix):
+    ids = set()
+    position = bisect_left(self.sorted_tokens, prefix)
+    while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(prefix):
+      ids |= self.postings[self.sorted_tokens[position]]
+      position += 1
+    return ids
+
+  def search(self, term, limit=None):
+    # every word of the term has to prefix-match a word of the document,
+    # a plain substring of the name matches too (same as the ILIKE search did)
+    words = tokenize(term)
+    needle = term.strip().lower()
+    with self.lock:
+      matches = None
+      for word in words:
+        ids = self._prefix_matches(word)
+        matches = ids if matches is None else matches & ids
+      matches = set(matches or ())
+      if needle:
+        matches.update(doc_id for doc_id, document in self.documents.items() if needle in document[0].lower())
+
+      ranked = []
+      for doc_id in matches:
+        name, name_tokens, tokens = self.documents[doc_id]
+        # exact words beat prefixes, and words of the name beat words of the other columns
+        rank = 0
+        for word in words:
+          if word in name_tokens:
+            rank += 4
+          elif any(token.startswith(word) for token in name_tokens):
+            rank += 2
+          elif word in tokens:
+            rank += 1
+        ranked.append((-rank, name.lower(), doc_id, name))
+    ranked.sort()
+
+    count = len(ranked)
+    if limit is not None:
+      ranked = ranked[:limit]
+    return count, [{'id': doc_id, 'name': name} for _, _, doc_id, name in ranked]
+
+
+  def suggest(self, term, limit):
+    # the names starting with the term (a range of sorted_names), then the names having a word starting with the
+    # first word of the term (a range of sorted_name_words) & words starting with the other ones; both scans stop
+    # after limit names, whatever the size of the catalog
+    needle = term.strip().lower()
+    words = tokenize(term)
+    suggestions = []
+    with self.lock:
+      position = bisect_left(self.sorted_names, (needle,))
+      while position < len(self.sorted_names) and len(suggestions) < limit and self.sorted_names[position][0].startswith(needle):
+        suggestions.append(self.sorted_names[position][1])
+        position += 1
+      if words:
+        found = set(suggestions)
+        position = bisect_left(self.sorted_name_words, (words[0],))
+        while position < len(self.sorted_name_words) and len(suggestions) < limit:
+          token, _, doc_id = self.sorted_name_words[position]
+          if not token.startswith(words[0]):
+            break
+          position += 1
+          name_tokens = self.documents[doc_id][1]
+          if doc_id not in found and all(any(name_token.startswith(word) for name_token in name_tokens) for word in words[1:]):
+            found.add(doc_id)
+            suggestions.append(doc_id)
+      return [{'id': doc_id, 'name': self.documents[doc_id][0]} for doc_id in suggestions]
+
+
+class Searcher(object):
+
+  def __init__(self, db, model, columns=SEARCH_COLUMNS):
+    self.db = db
+    self.model = model
+    self.columns = columns
+    self.index = None
+    self.lock = threading.Lock()
+    # (count, latest updated_at) of the table the index was built from, when to compare it again
+    self.built_from = None
+    self.next_check = 0
+
+  def uses_postgres(self):
+    return self.db.engine.dialect.name == 'postgresql'
+
+  def search(self, term, limit=None):
+    # returns the number of matches & the (id, name) of the best ranked ones, in the shape the search templates expect
+    term = (term or '').strip()
+    if not term:
+      return {'count': 0, 'data': []}
+    if self.uses_postgres():
+      count, data = self._search_postgres(term, limit)
+    else:
+      count, data = self._get_index().search(term, limit)
+    return {'count': count, 'data': data}
+
+  def suggest(self, term, limit):
+    # autocomplete: [{'id': ..., 'name': ...}] of the best limit names matching the term
+    term = (term or '').strip()
+    if not term:
+      return []
+    if self.uses_postgres():
+      return self._suggest_postgres(term, limit)
+    return self._get_index().suggest(term, limit)
+
+  def _suggest_postgres(self, term, limit):
+    pattern = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    if len(term) < MIN_INFIX_LENGTH:
+      # the index scan stops after limit names: the expression must stay identical to the one of the migration
+      sql = text(
+        'SELECT id, name FROM "%s" WHERE lower(name) COLLATE "C" LIKE :prefix ORDER BY lower(name) COLLATE "C" LIMIT :limit'
+        % self.model.__tablename__
+      )
+      rows = self.db.session.execute(sql, {'prefix': pattern.lower() + '%', 'limit': limit})
+      return [{'id': row.id, 'name': row.name} for row in rows]
+    # the trigram index on name serves the ILIKE; the names starting with the term come first
+    sql = text(
+      'SELECT id, name FROM "%s" WHERE name ILIKE :pattern ORDER BY name ILIKE :prefix DESC, name LIMIT :limit'
+      % self.model.__tablename__
+    )
+    rows = self.db.session.execute(sql, {'pattern': '%' + pattern + '%', 'prefix': pattern + '%', 'limit': limit})
+    return [{'id': row.id, 'name': row.name} for row in rows]
+
+  def _search_postgres(self, term, limit):
+    # the to_tsvector(...) expression must stay identical to the one of the index in the migration, otherwise
+    # the planner can't use the index; COUNT(*) OVER () counts the matches in the same statement, before the LIMIT
+    words = tokenize(term)
+    document = " || ' ' || ".join(
+      "coalesce(%s, '')" % COLUMN_DOCUMENTS.get(column, column + '::text') for column in self.columns
+    )
+    document = "to_tsvector('simple', %s)" % document
+    conditions = ["name ILIKE :pattern"]
+    rank = "similarity(name, :term)"
+    params = {
+      'term': term,
+      'pattern': '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%',
+      'limit': limit
+    }
+    if words:
+      params['query'] = ' & '.join(word + ':*' for word in words)
+      conditions.append("%s @@ to_tsquery('simple', :query)" % document)
+      rank = "ts_rank(%s, to_tsquery('simple', :query)) + %s" % (document, rank)
+    sql = text(
+      'SELECT id, name, COUNT(*) OVER () AS total FROM "%s" WHERE %s ORDER BY %s DESC, name LIMIT :limit'
+      % (self.model.__tablename__, ' OR '.join(conditions), rank)
+    )
+    rows = self.db.session.execute(sql, params).fetchall()
+    count = rows[0].total if rows else 0
+    return count, [{'id': row.id, 'name': row.name} for row in rows]
+
+  def _table_state(self):
+    # SQL query:
+    # SELECT COUNT(*), MAX(updated_at) FROM <table>
+    # on a connection of its own, not counted in the query budget of the request that happens to run it
+    with self.db.engine.connect() as connection:
+      return tuple(connection.execution_options(uninstrumented=True)
+        .execute(select(func.count(), func.max(self.model.updated_at)).select_from(self.model)).one())
+
+  def _check_index(self):
+    # one thread runs a due check, the others go on with the index as it is
+    if self.index is None or time.time() < self.next_check or not self.lock.acquire(False):
+      return
+    try:
+      if self._table_state() != self.built_from:
+        self.index = None
+      self.next_check = time.time() + current_app.config.get('SEARCH_INDEX_CHECK_INTERVAL', 30)
+    finally:
+      self.lock.release()
+
+  def _get_index(self):
+    self._check_index()
+    if self.index is None:
+      with self.lock:
+        if self.index is None:
+          # read first: a change made while the index is built is found by the next check
+          built_from = self._table_state()
+          index = InvertedIndex()
+          columns = [getattr(self.model, column) for column in ('id',) + tuple(self.columns)]
+          for row in self.db.session.query(*columns):
+            index.add(row[0], row[1], row[2:])
+          self.built_from = built_from
+          self.next_check = time.time() + current_app.config.get('SEARCH_INDEX_CHECK_INTERVAL', 30)
+          self.index = index
+    return self.index
+
+  def add(self, entity):
+    # called after an insert or an update was committed
+    if self.index is not None:
+      self.index.add(entity.id, entity.name, [getattr(entity, column) for column in self.columns[1:]])
+
+  def remove(self, entity_id):
+    if self.index is not None:
+      self.index.remove(entity_id)
+
+  def reset(self):
+    # after bulk changes: the in-memory index is rebuilt from the table on the next search
+    with self.lock:
+      self.index = None
@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+from datetime import timedelta
+from flask import Blueprint, render_template, request, flash, current_app, abort
+from extensions import db, cache
+from instrumentation import query_budget
+from models import Show
+
+bp = Blueprint('shows', __name__)
+
+@bp.route('/shows')
+@cache.cached('shows', 'venues', 'artists')
+@query_budget(1)
+def shows():
+  # ?after=<cursor> continues the listing right after the last show of the previous page
+  after = request.args.get('after')
+  if after:
+    try:
+      after = Show.decodeCursor(after)
+    except ValueError:
+      abort(400)
+
+  data, next_cursor = Show.getFeed(after=after, limit=current_app.config['SHOWS_PER_PAGE'])
+  if next_cursor:
+    next_cursor = Show.encodeCursor(next_cursor)
+
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
+
+@bp.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  # WTForms is only imported by the form pages
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  dataFromForm = request.form
+
+  try:
+    # retrieve show's data from the form submitted by the user 
+    newShow = Show(
+      venue_id = dataFromForm.get('venue_id'),
+      artist_id = dataFromForm.get('artist_id'),
+      start_time = dataFromForm.get('start_time')
+    )
+    # add the new show to the DB
+    Show.addShow(newShow)
+  except:
+    flash('An error occurred. Show could not be listed.')
+    db.session.rollback()
+  finally:
+    # on successful db show, flash success
+    flash('Show was successfully listed!')
+    return render_template('pages/home.html')
+
+@bp.route('/shows/batch')
+def create_show_batch():
+  # WTForms is only imported by the form pages
+  from forms import ShowBatchForm
+  form = ShowBatchForm()
+  return render_template('forms/new_shows.html', form=form, errors=[])
+
+@bp.route('/shows/batch', methods=['POST'])
+def create_show_batch_submission():
+  from forms import ShowBatchForm
+  form = ShowBatchForm(request.form)
+  # one show per line: artist_id, venue_id, start_time
+  rows = []
+  for line in request.form.get('shows', '').splitlines():
+    if line.strip():
+      values = [value.strip() for value in line.split(',', 2)]
+      rows.append(dict(zip(('artist_id', 'venue_id', 'start_time'), values)))
+
+  if not rows or len(rows) > current_app.config['SHOW_BATCH_MAX_SIZE']:
+    errors = [{'row': None, 'error': 'a batch has 1 to %d shows' % current_app.config['SHOW_BATCH_MAX_SIZE']}]
+  else:
+    shows, errors = Show.parseSchedule(rows)
+    if not errors:
+      errors = Show.scheduleShows(shows, timedelta(minutes=current_app.config['SHOW_SLOT_MINUTES']))
+  if errors:
+    flash('An error occurred. The shows could not be listed.')
+    return render_template('forms/new_shows.html', form=form, errors=errors), 400
+
+  flash('%d shows were successfully listed!' % len(shows))
+  return render_template('pages/home.html')
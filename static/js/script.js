@@ -2,3 +2,88 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Typeahead of the inputs with data-autocomplete="venues|artists": the names matching the typed text come from
+// /api/v1/autocomplete/<kind>, picking one writes its id into the input named by data-autocomplete-target.
+// Requests wait for a pause in the typing (debounced), answers are kept per text, and an answer arriving after
+// a newer request was sent is dropped.
+(function () {
+  var DEBOUNCE_MS = 150;
+
+  function setUpAutocomplete(input) {
+    var kind = input.getAttribute('data-autocomplete');
+    var target = document.getElementById(input.getAttribute('data-autocomplete-target'));
+    var menu = document.createElement('ul');
+    var answers = {};
+    var timer = null;
+    var latest = 0;
+
+    menu.className = 'dropdown-menu autocomplete-menu';
+    input.parentNode.style.position = 'relative';
+    input.parentNode.appendChild(menu);
+    input.setAttribute('autocomplete', 'off');
+
+    function close() {
+      menu.style.display = 'none';
+      menu.innerHTML = '';
+    }
+
+    function show(suggestions) {
+      menu.innerHTML = '';
+      suggestions.forEach(function (suggestion) {
+        var item = document.createElement('li');
+        var link = document.createElement('a');
+        link.href = '#';
+        link.textContent = suggestion.name + ' (#' + suggestion.id + ')';
+        // mousedown runs before the blur of the input closes the menu
+        link.addEventListener('mousedown', function (event) {
+          event.preventDefault();
+          input.value = suggestion.name;
+          target.value = suggestion.id;
+          close();
+        });
+        item.appendChild(link);
+        menu.appendChild(item);
+      });
+      menu.style.display = suggestions.length ? 'block' : 'none';
+    }
+
+    function lookUp(text) {
+      // a newer lookup, even one answered from the kept answers, wins over the requests still in flight
+      var request = ++latest;
+      if (answers.hasOwnProperty(text)) {
+        show(answers[text]);
+        return;
+      }
+      fetch('/api/v1/autocomplete/' + kind + '?q=' + encodeURIComponent(text))
+        .then(function (response) { return response.json(); })
+        .then(function (answer) {
+          answers[text] = answer.data;
+          if (request === latest) {
+            show(answer.data);
+          }
+        })
+        .catch(function () {
+          if (request === latest) {
+            close();
+          }
+        });
+    }
+
+    input.addEventListener('input', function () {
+      var text = input.value.trim();
+      // the id no longer matches the typed name
+      target.value = '';
+      clearTimeout(timer);
+      if (!text) {
+        latest++;
+        close();
+        return;
+      }
+      timer = setTimeout(function () { lookUp(text); }, DEBOUNCE_MS);
+    });
+    input.addEventListener('blur', close);
+  }
+
+  document.querySelectorAll('[data-autocomplete]').forEach(setUpAutocomplete);
+})();
@@ -0,0 +1,97 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#----------------------------------------------------------------------------#
+# Every test builds its own app with TestConfig (strict query budgets, no
+# response cache, synchronous jobs). The database is TEST_DATABASE_URL when it
+# is set, a SQLite file of the test otherwise:
+#
+#   $ python -m pytest -q
+#   $ TEST_DATABASE_URL=postgresql://localhost:5432/fyyur_test python -m pytest -q
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from extensions import db, jobs  # noqa: E402
+from models import Venue, Artist, Show, ShowCounters, venue_search, artist_search  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+  # make_app(SETTING=value, ...) -> an app with its tables created; the settings override TestConfig
+  apps = []
+
+  def factory(**settings):
+    settings.setdefault('SQLALCHEMY_DATABASE_URI', os.environ.get('TEST_DATABASE_URL') or
+      'sqlite:///' + str(tmp_path / 'primary.sqlite'))
+    app = create_app(type('Config', (TestConfig,), settings))
+    with app.app_context():
+      db.drop_all()
+      db.create_all()
+    # the in-memory search indexes (SQLite) & the keys of the queued jobs belong to the module, not to the app
+    venue_search.reset()
+    artist_search.reset()
+    jobs.seen_keys.clear()
+    apps.append(app)
+    return app
+
+  yield factory
+  for app in apps:
+    with app.app_context():
+      db.session.remove()
+      db.drop_all()
+      db.engine.dispose()
+    for replica in app.extensions['replicas'].replicas:
+      replica.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+  return make_app()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+def add_catalog(venues=3, artists=3, shows_per_venue=2):
+  # venues in two areas, each with upcoming & past shows; returns the ids of the venues & artists
+  now = datetime.now()
+  venue_rows = [Venue(name='Venue %d' % number, genres=['Jazz'], city='City %d' % (number % 2), state='CA',
+    address='1 Main St', phone='555-555-5555', website='https://example.com', image_link='https://example.com/v.jpg',
+    facebook_link='https://facebook.com/venue') for number in range(venues)]
+  artist_rows = [Artist(name='Artist %d' % number, city='City', state='CA', phone='555-555-5555',
+    website='https://example.com', genres=['Jazz'], image_link='https://example.com/a.jpg',
+    facebook_link='https://facebook.com/artist') for number in range(artists)]
+  db.session.add_all(venue_rows + artist_rows)
+  db.session.flush()
+  for position, venue in enumerate(venue_rows):
+    for number in range(shows_per_venue):
+      days = number + 1 if number % 2 else -(number + 1)
+      db.session.add(Show(venue.id, artist_rows[(position + number) % artists].id, now + timedelta(days=days)))
+  db.session.commit()
+  ShowCounters.reconcile(now)
+  return [venue.id for venue in venue_rows], [artist.id for artist in artist_rows]
+
+
+@pytest.fixture
+def statements(app):
+  # the SQL statements run on the primary while the test runs
+  executed = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    executed.append(statement)
+
+  with app.app_context():
+    engine = db.engine
+  event.listen(engine, 'before_cursor_execute', record)
+  yield executed
+  event.remove(engine, 'before_cursor_execute', record)
@@ -0,0 +1,25 @@
+from conftest import add_catalog
+from extensions import db
+from models import Venue
+
+
+def test_list_etag_changes_when_changes_cancel_out(app, client):
+  with app.app_context():
+    venue_ids, _ = add_catalog(venues=2, shows_per_venue=2)
+  response = client.get('/api/v1/venues')
+  etag = response.headers['ETag']
+  # the body is streamed: read it, so that its request context is closed
+  response.get_data()
+  assert client.get('/api/v1/venues', headers={'If-None-Match': etag}).status_code == 304
+
+  # one counter up, the other down & updated_at kept, as ShowCounters does: the sum & latest time don't change
+  with app.app_context():
+    for venue_id, step in zip(venue_ids, (1, -1)):
+      db.session.execute(db.update(Venue).where(Venue.id == venue_id).values(
+        upcoming_shows_count=Venue.upcoming_shows_count + step, updated_at=Venue.updated_at))
+    db.session.commit()
+
+  response = client.get('/api/v1/venues', headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert response.headers['ETag'] != etag
+  response.get_data()
@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+
+from extensions import db
+from instrumentation import QueryBudgetExceeded, query_budget
+from models import Venue, Artist
+
+
+def add_budget_views(app):
+  @query_budget(1)
+  def one_query():
+    db.session.execute(db.select(Venue.id)).all()
+    return 'ok'
+
+  @query_budget(1)
+  def two_queries():
+    db.session.execute(db.select(Venue.id)).all()
+    db.session.execute(db.select(Artist.id)).all()
+    return 'ok'
+
+  app.add_url_rule('/one-query', 'one_query', one_query)
+  app.add_url_rule('/two-queries', 'two_queries', two_queries)
+
+
+def test_query_budget_exceeded_raises_when_strict(app):
+  add_budget_views(app)
+  assert app.config['SQL_QUERY_BUDGET_STRICT']
+
+  with pytest.raises(QueryBudgetExceeded, match='two_queries issued 2 queries, over its budget of 1'):
+    app.test_client().get('/two-queries')
+
+
+def test_query_budget_exceeded_logs_when_not_strict(make_app, caplog):
+  app = make_app(SQL_QUERY_BUDGET_STRICT=False)
+  add_budget_views(app)
+
+  with caplog.at_level(logging.WARNING):
+    response = app.test_client().get('/two-queries')
+
+  assert response.status_code == 200
+  assert 'two_queries issued 2 queries, over its budget of 1' in caplog.text
+
+
+def test_query_within_budget_reports_its_queries(app):
+  add_budget_views(app)
+
+  response = app.test_client().get('/one-query')
+
+  assert response.status_code == 200
+  assert 'desc="1 queries"' in response.headers['Server-Timing']
@@ -0,0 +1,19 @@
+from extensions import db, jobs
+
+
+def test_a_rolled_back_key_can_be_queued_again(app):
+  ran = []
+  jobs.register('test.record', ran.append)
+  with app.app_context():
+    assert jobs.enqueue('test.record', 1, key='test:once')
+    db.session.rollback()
+    assert ran == []
+
+    assert jobs.enqueue('test.record', 2, key='test:once')
+    assert not jobs.enqueue('test.record', 3, key='test:once')
+    db.session.commit()
+    assert ran == [2]
+
+    assert not jobs.enqueue('test.record', 4, key='test:once')
+    db.session.commit()
+  assert ran == [2]
@@ -0,0 +1,71 @@
+import shutil
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from conftest import add_catalog
+from extensions import db
+from replicas import STICKY_COOKIE
+
+
+@pytest.fixture
+def replicated(make_app, tmp_path):
+  # a primary & a replica SQLite file, whatever TEST_DATABASE_URL is; the replica is a copy of the primary in which
+  # the venue is renamed, so that a page tells which database it was read from
+  primary, replica = tmp_path / 'replicated.sqlite', tmp_path / 'replica.sqlite'
+  app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///%s' % primary, SQLALCHEMY_REPLICA_URIS=['sqlite:///%s' % replica])
+  with app.app_context():
+    (venue_id,), _ = add_catalog(venues=1)
+    db.engine.dispose()
+  shutil.copy(str(primary), str(replica))
+  connection = sqlite3.connect(str(replica))
+  connection.execute('UPDATE "Venue" SET name = ? WHERE id = ?', ('Replica Venue', venue_id))
+  connection.commit()
+  connection.close()
+  app.venue_id = venue_id
+  return app
+
+
+def venue_name(client, venue_id):
+  page = client.get('/venues/%d' % venue_id).get_data(as_text=True)
+  return page.split('<h1 class="monospace">', 1)[1].split('</h1>', 1)[0].strip()
+
+
+def test_read_only_requests_read_from_the_replica(replicated):
+  client = replicated.test_client()
+
+  assert venue_name(client, replicated.venue_id) == 'Replica Venue'
+  assert 'Replica Venue' in client.post('/venues/search', data={'search_term': 'venue'}).get_data(as_text=True)
+
+
+def test_sticky_cookie_reads_from_the_primary(replicated):
+  client = replicated.test_client()
+  client.set_cookie(STICKY_COOKIE, '1')
+
+  assert venue_name(client, replicated.venue_id) == 'Venue 0'
+
+
+def test_writes_go_to_the_primary_and_stick_the_client_to_it(replicated):
+  client = replicated.test_client()
+
+  response = client.post('/venues/%d/edit' % replicated.venue_id, data={
+    'name': 'Edited Venue', 'genres': 'Jazz', 'city': 'City 0', 'state': 'CA', 'address': '1 Main St',
+    'phone': '555-555-5555', 'website': 'https://example.com', 'facebook_link': 'https://facebook.com/venue'
+  })
+
+  assert response.status_code == 302
+  assert STICKY_COOKIE + '=1' in response.headers['Set-Cookie']
+  # read your writes: this client reads from the primary, the others from the replica (not caught up yet)
+  assert venue_name(client, replicated.venue_id) == 'Edited Venue'
+  assert venue_name(replicated.test_client(), replicated.venue_id) == 'Replica Venue'
+
+
+def test_unhealthy_replica_falls_back_to_the_primary(replicated, tmp_path):
+  (replica,) = replicated.extensions['replicas'].replicas
+  replica.engine.dispose()
+  replica.engine = create_engine('sqlite:///%s' % (tmp_path / 'missing' / 'replica.sqlite'))
+  replica.next_check = 0
+
+  assert venue_name(replicated.test_client(), replicated.venue_id) == 'Venue 0'
+  assert not replica.healthy
@@ -0,0 +1,73 @@
+from conftest import add_catalog
+from models import Venue
+
+
+def test_venue_directory_query_count(app, client, statements):
+  with app.app_context():
+    add_catalog(venues=12, shows_per_venue=3)
+  del statements[:]
+
+  response = client.get('/venues?sort=city')
+
+  assert response.status_code == 200
+  # 2 statements: the page of venues with their precomputed upcoming shows counts, then the count of the pager
+  # (cached with the response cache on); not one query per venue or area
+  assert len(statements) == 2
+  assert 'FROM "Venue"' in statements[0] and 'JOIN' not in statements[0]
+  assert 'count(' in statements[1].lower()
+
+
+def test_venue_directory_query_count_does_not_grow_with_the_catalog(app, client, statements):
+  with app.app_context():
+    add_catalog(venues=2)
+  del statements[:]
+  client.get('/venues')
+  small = len(statements)
+
+  with app.app_context():
+    add_catalog(venues=40, shows_per_venue=4)
+  del statements[:]
+  client.get('/venues')
+
+  assert len(statements) == small
+
+
+def test_venue_directory_groups_the_venues_by_area(app, client):
+  with app.app_context():
+    add_catalog(venues=4)
+
+  page = client.get('/venues?sort=city').get_data(as_text=True)
+
+  assert page.count('<h3>City 0, CA</h3>') == 1
+  assert page.count('<h3>City 1, CA</h3>') == 1
+  assert page.index('Venue 0') < page.index('City 1, CA') < page.index('Venue 1')
+
+
+def test_delete_venue_answers_json(app, client):
+  with app.app_context():
+    venue_ids, _ = add_catalog(venues=1, shows_per_venue=0)
+
+  response = client.delete('/venues/%d' % venue_ids[0])
+  assert response.status_code == 200
+  assert response.get_json() == {'success': True}
+
+  response = client.delete('/venues/%d' % venue_ids[0])
+  assert response.status_code == 404
+  assert response.get_json() == {'success': False}
+
+
+def test_create_venue_rejects_an_unknown_genre(app, client):
+  form = {'name': 'New Venue', 'city': 'City', 'state': 'CA', 'address': '1 Main St', 'phone': '555-555-5555',
+    'genres': ['Jazz', 'Polka'], 'facebook_link': 'https://facebook.com/new', 'website': 'https://example.com'}
+
+  response = client.post('/venues/create', data=form)
+
+  assert response.status_code == 400
+  assert 'could not be listed' in response.get_data(as_text=True)
+  with app.app_context():
+    assert Venue.query.count() == 0
+
+  form['genres'] = ['Jazz']
+  assert client.post('/venues/create', data=form).status_code == 200
+  with app.app_context():
+    assert Venue.query.count() == 1
@@ -0,0 +1,186 @@
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from itertools import groupby
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, jsonify
+from sqlalchemy.exc import SQLAlchemyError
+from extensions import db, cache
+from genres import GENRES
+from instrumentation import query_budget
+from listing import parse_listing
+from replicas import read_only
+from models import Venue, venue_search
+
+bp = Blueprint('venues', __name__)
+
+@bp.route('/venues')
+@cache.cached('venues', 'shows')
+@query_budget(2)
+def venues():
+  # ?genre=Jazz only lists the venues tagged with that genre; ?sort=city|name|upcoming, ?letter=M & ?after=<cursor>
+  # select a page of the directory (see listing.py)
+  genre = request.args.get('genre')
+  if genre and genre not in GENRES:
+    abort(400)
+  sort, limit, after, letter = parse_listing('city', current_app.config['LISTING_PAGE_SIZE'], current_app.config['LISTING_MAX_PAGE_SIZE'])
+
+  # the page of venues (& their precomputed upcoming shows count) comes from a single query, the total is cached
+  data, next_cursor = Venue.getListing(sort=sort, limit=limit, after=after, letter=letter, genre=genre)
+  count, estimated = Venue.countListing(genre=genre)
+
+  if sort == 'city':
+    # the rows are ordered by city & state, so every area is one consecutive run of rows
+    areas = [{'city': city, 'state': state, 'venues': list(venues_in_area)}
+      for (city, state), venues_in_area in groupby(data, key=lambda venue: (venue['city'], venue['state']))]
+  else:
+    areas = [{'city': None, 'state': None, 'venues': data}]
+
+  return render_template('pages/venues.html', areas=areas, listing={
+    'endpoint': 'venues.venues', 'sort': sort, 'letter': letter, 'genre': genre, 'limit': limit,
+    'next_cursor': next_cursor, 'count': count, 'estimated': estimated, 'noun': 'venues'
+  })
+
+@bp.route('/venues/search', methods=['POST'])
+@read_only
+@query_budget(1)
+def search_venues():
+  # ranked, prefix matching search across name, city, state & genres; the count comes from the index
+  response = venue_search.search(request.form.get('search_term', ''), limit=current_app.config['SEARCH_RESULTS_LIMIT'])
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/venues/<int:venue_id>')
+@cache.cached('venue:{venue_id}', 'artists')
+@query_budget(1)
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  # TODO - Done: replace with real venue data from the venues table, using venue_id
+  
+  # the venue & all its shows (with their artist) come from a single query,
+  # then they are split into upcoming & past shows against the same current time
+  venue_details = Venue.getDetailsWithShows(venue_id, datetime.now())
+
+  # check if venue exists, otherwise redirect to 404 page (NOT FOUND)
+  if venue_details:
+    return render_template('pages/show_venue.html', venue=venue_details)
+  else:
+    return render_template('errors/404.html')
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  # WTForms is only imported by the form pages
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+
+  dataFromForm = request.form
+  # an unknown genre would only fail when the row is written (GenreList raises ValueError): checked against the
+  # choices of the form first
+  from forms import VenueForm
+  form = VenueForm(request.form)
+  if not form.genres.validate(form):
+    flash('Venue ' + dataFromForm.get('name', '') + ' could not be listed: ' + ' '.join(form.genres.errors))
+    return render_template('forms/new_venue.html', form=form), 400
+
+  try:
+    # retrieve venue's data from the form submitted by the user 
+    newVenue = Venue(
+      name = dataFromForm.get('name'),
+      genres = dataFromForm.getlist('genres'),
+      website = dataFromForm.get('website'),
+      city = dataFromForm.get('city'),
+      state = dataFromForm.get('state'),
+      address = dataFromForm.get('address'),
+      phone = dataFromForm.get('phone'),
+      image_link = dataFromForm.get('image_link'),
+      facebook_link = dataFromForm.get('facebook_link')
+    )
+    # SQL query
+    # INSERT INTO Venue (name, genres, website, city, state, address, phone, image_link, facebook_link) VALUES (newVenue.name, newVenue.genres, newVenue.website, newVenue.city, newVenue.state, newVenue.address, newVenue.phone, newVenue.image_link, newVenue.facebook_link)
+    # add the new venue to the DB
+    Venue.addVenue(newVenue)
+    # on successful db insert, flash success
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    return render_template('pages/home.html')
+  except SQLAlchemyError:
+    db.session.rollback()
+    flash('An error occurred. Venue ' + dataFromForm.get('name', '') + ' could not be listed.')
+    return render_template('pages/home.html')
+
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # called with fetch() from the venue page: answers JSON, the flashed message shows on the next page
+  venue_query = Venue.query.get(venue_id)
+  if not venue_query:
+    flash('Venue ' + str(venue_id) + ' was not found, it could not be deleted.')
+    return jsonify({'success': False}), 404
+
+  try:
+    # SQL query:
+    # DELETE FROM Venue WHERE id = venue_id
+    Venue.deleteVenue(venue_query)
+  except SQLAlchemyError:
+    db.session.rollback()
+    flash('An error occurred while deleting the venue, please try again later')
+    return jsonify({'success': False}), 500
+  return jsonify({'success': True})
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  # SQL query:
+  # SELECT * FROM Venue WHERE id = venue_id
+  venue_query = Venue.query.get(venue_id)
+
+  # fill the form with the data already available, what isn't available will remain empty for the user to fill in
+  if venue_query:
+    venue_details = Venue.getDetails(venue_query)
+    form.name.data = venue_details["name"]
+    form.genres.data = venue_details["genres"]
+    form.address.data = venue_details["address"]
+    form.website.data = venue_details["website"]
+    form.city.data = venue_details["city"]
+    form.state.data = venue_details["state"]
+    form.phone.data = venue_details["phone"]
+    form.facebook_link.data = venue_details["facebook_link"]
+    return render_template('forms/edit_venue.html', form=form, venue=venue_details)
+  return render_template('errors/404.html')
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # venue record with ID <venue_id> using the new attributes
+  # SQL query:
+  # SELECT * FROM Venue WHERE id = venue_id
+  venue_query = Venue.query.get(venue_id)
+
+  # upating the form with the user's entered data
+  if venue_query:
+    from forms import VenueForm
+    form = VenueForm(request.form)
+    if not form.genres.validate(form):
+      flash('Venue ' + str(venue_id) + ' was not updated: ' + ' '.join(form.genres.errors))
+      return redirect(url_for('venues.edit_venue', venue_id=venue_id))
+    setattr(venue_query, 'name', request.form.get('name'))
+    setattr(venue_query, 'genres', request.form.getlist('genres'))
+    setattr(venue_query, 'city', request.form.get('city'))
+    setattr(venue_query, 'website', request.form.get('website'))
+    setattr(venue_query, 'state', request.form.get('state'))
+    setattr(venue_query, 'address', request.form.get('address'))
+    setattr(venue_query, 'phone', request.form.get('phone'))
+    setattr(venue_query, 'facebook_link', request.form.get('facebook_link'))
+    Venue.updateVenue(venue_query)
+    # SQL query:
+    # UPDATE Venue SET 'name' = request.form.get('name'), 'genres'= request.form.getlist('genres'))...WHERE id = venue_id
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))
+  return render_template('errors/404.html')